@@ -0,0 +1,60 @@
+# access.py
+from functools import wraps
+from flask import abort, flash, redirect, url_for
+from flask_login import current_user
+from sqlalchemy.orm import contains_eager
+from models import Project, Task
+
+
+def _permission_denied(action, forbidden):
+    if forbidden:
+        abort(403)
+    flash(f"You do not have permission to {action}.", "danger")
+    return redirect(url_for("dashboard"))
+
+
+def owned_project(action, forbidden=False):
+    """
+    Decorate a view taking project_id so it receives the Project instead.
+    Responds 404 if the project does not exist or is being deleted, and
+    redirects to the
+    dashboard if it belongs to another user. With forbidden, other
+    users' projects get a 403 instead, for views fetched by scripts
+    rather than browsed to.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(project_id, **kwargs):
+            project = Project.query.get_or_404(project_id)
+            if project.deleting:
+                abort(404)
+            if project.user_id != current_user.id:
+                return _permission_denied(action, forbidden)
+            return view(project, **kwargs)
+        return wrapper
+    return decorator
+
+
+def owned_task(action, forbidden=False):
+    """
+    Decorate a view taking task_id so it receives the Task instead.
+    The task and its project are loaded together in one joined query,
+    so the ownership check and later uses of task.project need no
+    further round trips. Other users' tasks are handled as in
+    owned_project.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(task_id, **kwargs):
+            task = (
+                Task.query
+                .join(Task.project)
+                .options(contains_eager(Task.project))
+                .filter(Task.id == task_id, ~Project.deleting)
+                .first_or_404()
+            )
+            if task.project.user_id != current_user.id:
+                return _permission_denied(action, forbidden)
+            return view(task, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,390 @@
+# api.py
+from flask import Blueprint, abort, current_app, jsonify, request
+from flask_login import current_user
+from sqlalchemy.orm import contains_eager
+from werkzeug.exceptions import HTTPException
+from db import db
+from events import publish, publish_task, publish_task_deleted
+from models import PRIORITY_RANKS, Project, Task, TASK_STATUSES
+from queries import (
+    bump_project_version,
+    change_task_status,
+    delete_project_tasks,
+    empty_rollup,
+    normalise_sort,
+    project_rollups,
+    reposition_task,
+    task_ordering,
+    task_page,
+)
+from validation import DATE_FORMAT, task_fields
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+# Longest project name the database accepts
+MAX_NAME_LENGTH = 128
+
+
+@api.before_request
+def require_login():
+    """
+    Answers 401 for anonymous API calls rather than redirecting
+    to the login page.
+    """
+    if not current_user.is_authenticated:
+        return jsonify(error="Authentication required."), 401
+
+
+@api.errorhandler(HTTPException)
+def json_error(error):
+    """
+    Reports errors raised by API views as JSON.
+    """
+    return jsonify(error=error.description), error.code
+
+
+def _json_body():
+    # get_json rejects non-JSON requests with 415, which also keeps
+    # cross-site form posts out of the API
+    data = request.get_json()
+    if not isinstance(data, dict):
+        abort(400, "Expected a JSON object.")
+    return data
+
+
+def _validated(fields_or_error):
+    try:
+        return fields_or_error()
+    except ValueError as e:
+        abort(400, str(e))
+
+
+def _project_fields(data, partial=False):
+    fields = {}
+    if not partial or "name" in data:
+        name = data.get("name")
+        name = name.strip() if isinstance(name, str) else ""
+        if not name:
+            raise ValueError("Project name is required.")
+        if len(name) > MAX_NAME_LENGTH:
+            raise ValueError(
+                f"Project name must be at most {MAX_NAME_LENGTH} characters."
+            )
+        fields["name"] = name
+    if not partial or "description" in data:
+        description = data.get("description")
+        if description is not None and not isinstance(description, str):
+            raise ValueError("Project description must be text.")
+        fields["description"] = description or None
+    return fields
+
+
+def _owned_project(project_id):
+    # Other users' projects are reported as missing, not forbidden
+    return Project.query.filter_by(
+        id=project_id, user_id=current_user.id, deleting=False
+    ).first_or_404(description="Project not found.")
+
+
+def _owned_tasks_query():
+    return (
+        Task.query
+        .join(Task.project)
+        .options(contains_eager(Task.project))
+        .filter(Project.user_id == current_user.id, ~Project.deleting)
+    )
+
+
+def _owned_task(task_id):
+    return _owned_tasks_query().filter(Task.id == task_id).first_or_404(
+        description="Task not found."
+    )
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def project_to_dict(project, rollup=None):
+    data = {
+        "id": project.id,
+        "name": project.name,
+        "description": project.description,
+        "created_at": _isoformat(project.created_at),
+        "updated_at": _isoformat(project.updated_at),
+        "version": project.version,
+    }
+    if rollup is not None:
+        data["task_counts"] = rollup
+    return data
+
+
+def task_to_dict(task):
+    return {
+        "id": task.id,
+        "project_id": task.project_id,
+        "title": task.title,
+        "description": task.description,
+        "status": task.status,
+        "priority": task.priority,
+        "position": task.position,
+        "due_date": (
+            task.due_date.strftime(DATE_FORMAT) if task.due_date else None
+        ),
+        "created_at": _isoformat(task.created_at),
+        "updated_at": _isoformat(task.updated_at),
+    }
+
+
+def _forget_cards(task_ids):
+    card_cache = current_app.extensions["card_cache"]
+    for task_id in task_ids:
+        card_cache.invalidate(task_id)
+
+
+# --- PROJECTS ---
+
+
+@api.route("/projects", methods=["GET"])
+def list_projects():
+    """
+    Lists the current user's projects with their task counts.
+    """
+    projects = Project.query.filter_by(
+        user_id=current_user.id, deleting=False
+    ).order_by(
+        Project.id
+    )
+    rollups = project_rollups(current_user.id)
+    return jsonify(projects=[
+        project_to_dict(project, rollups.get(project.id, empty_rollup()))
+        for project in projects
+    ])
+
+
+@api.route("/projects", methods=["POST"])
+def create_project():
+    """
+    Creates a project from a JSON body with a name and description.
+    """
+    fields = _validated(lambda: _project_fields(_json_body()))
+    project = Project(user_id=current_user.id, **fields)
+    db.session.add(project)
+    db.session.commit()
+    return jsonify(project=project_to_dict(project)), 201
+
+
+@api.route("/projects/<int:project_id>", methods=["GET"])
+def get_project(project_id):
+    """
+    Returns a single project.
+    """
+    return jsonify(project=project_to_dict(_owned_project(project_id)))
+
+
+@api.route("/projects/<int:project_id>", methods=["PATCH"])
+def update_project(project_id):
+    """
+    Updates the fields of a project present in the JSON body.
+    """
+    project = _owned_project(project_id)
+    fields = _validated(lambda: _project_fields(_json_body(), partial=True))
+    for name, value in fields.items():
+        setattr(project, name, value)
+    bump_project_version(project.id)
+    db.session.commit()
+    publish(project.id, "project_updated", name=project.name,
+            description=project.description)
+    return jsonify(project=project_to_dict(project))
+
+
+@api.route("/projects/<int:project_id>", methods=["DELETE"])
+def delete_project(project_id):
+    """
+    Deletes a project and all of its tasks.
+    """
+    project = _owned_project(project_id)
+    delete_project_tasks(project.id)
+    db.session.delete(project)
+    db.session.commit()
+    publish(project_id, "project_deleted")
+    return "", 204
+
+
+# --- TASKS ---
+
+
+@api.route("/projects/<int:project_id>/tasks", methods=["GET"])
+def list_tasks(project_id):
+    """
+    Lists a project's tasks a page at a time.
+    Accepts status and priority filters, sort_by and sort_order as on
+    the project page, limit, and the cursor returned by the previous
+    page.
+    """
+    project = _owned_project(project_id)
+    sort_by, sort_order = normalise_sort(
+        request.args.get("sort_by", "created_at"),
+        request.args.get("sort_order", "desc"),
+    )
+    max_limit = current_app.config["API_PAGE_SIZE_MAX"]
+    limit = request.args.get("limit", max_limit, type=int)
+    limit = min(max(limit, 1), max_limit)
+
+    query = Task.query.filter(Task.project_id == project.id)
+    status = request.args.get("status")
+    if status:
+        if status not in TASK_STATUSES:
+            abort(400, f"Unknown status: {status}.")
+        query = query.filter(Task.status == status)
+    priority = request.args.get("priority")
+    if priority:
+        if priority not in PRIORITY_RANKS:
+            abort(400, f"Unknown priority: {priority}.")
+        query = query.filter(Task.priority == priority)
+    query = query.order_by(*task_ordering(sort_by, sort_order))
+
+    try:
+        tasks, next_cursor = task_page(
+            query, sort_by, sort_order, limit, request.args.get("cursor")
+        )
+    except ValueError:
+        abort(400, "Invalid cursor.")
+    return jsonify(
+        tasks=[task_to_dict(task) for task in tasks],
+        next_cursor=next_cursor,
+    )
+
+
+@api.route("/projects/<int:project_id>/tasks", methods=["POST"])
+def create_task(project_id):
+    """
+    Creates a task in a project from a JSON body.
+    """
+    project = _owned_project(project_id)
+    fields = _validated(lambda: task_fields(_json_body()))
+    task = Task(project_id=project.id, **fields)
+    db.session.add(task)
+    bump_project_version(project.id)
+    db.session.commit()
+    publish_task("task_created", task)
+    return jsonify(task=task_to_dict(task)), 201
+
+
+@api.route("/tasks/<int:task_id>", methods=["GET"])
+def get_task(task_id):
+    """
+    Returns a single task.
+    """
+    return jsonify(task=task_to_dict(_owned_task(task_id)))
+
+
+@api.route("/tasks/<int:task_id>", methods=["PATCH"])
+def update_task(task_id):
+    """
+    Updates the fields of a task present in the JSON body.
+    """
+    task = _owned_task(task_id)
+    fields = _validated(lambda: task_fields(_json_body(), partial=True))
+    change_task_status(task, fields.pop("status", task.status))
+    for name, value in fields.items():
+        setattr(task, name, value)
+    bump_project_version(task.project_id)
+    db.session.commit()
+    _forget_cards([task.id])
+    publish_task("task_updated", task)
+    return jsonify(task=task_to_dict(task))
+
+
+@api.route("/tasks/<int:task_id>/move", methods=["PATCH"])
+def move_task(task_id):
+    """
+    Moves a task to another column, or within its column, from a body
+    of the form {"status": "Done", "before_id": 12}. Without before_id
+    the task goes to the end of the column.
+    Answers with just the task's new status and position.
+    """
+    task = _owned_task(task_id)
+    data = _json_body()
+    status = data.get("status", task.status)
+    if status not in TASK_STATUSES:
+        abort(400, f"Unknown status: {status}.")
+
+    before = None
+    before_id = data.get("before_id")
+    if before_id is not None:
+        if not isinstance(before_id, int) or before_id == task.id:
+            abort(400, "before_id must be the id of another task.")
+        before = Task.query.filter_by(
+            id=before_id, project_id=task.project_id, status=status
+        ).first_or_404(description="Task to move before not found.")
+
+    reposition_task(task, status, before)
+    bump_project_version(task.project_id)
+    db.session.commit()
+    _forget_cards([task.id])
+    publish_task("task_moved", task)
+    return jsonify(id=task.id, status=task.status, position=task.position)
+
+
+@api.route("/tasks/<int:task_id>", methods=["DELETE"])
+def delete_task(task_id):
+    """
+    Deletes a task.
+    """
+    task = _owned_task(task_id)
+    project_id = task.project_id
+    db.session.delete(task)
+    bump_project_version(project_id)
+    db.session.commit()
+    _forget_cards([task_id])
+    publish_task_deleted(project_id, task_id)
+    return "", 204
+
+
+@api.route("/tasks/batch", methods=["POST"])
+def batch_update_tasks():
+    """
+    Applies many partial task updates in one transaction, from a body
+    of the form {"updates": [{"id": 1, "status": "Done"}, ...]}.
+    Either every update is applied or, on any error, none are.
+    """
+    updates = _json_body().get("updates")
+    if not isinstance(updates, list) or not updates:
+        abort(400, "Expected a non-empty list of updates.")
+    limit = current_app.config["API_BATCH_LIMIT"]
+    if len(updates) > limit:
+        abort(400, f"At most {limit} updates are allowed per batch.")
+
+    changes = {}
+    for index, update in enumerate(updates):
+        if not isinstance(update, dict) or \
+                not isinstance(update.get("id"), int):
+            abort(400, f"Update {index}: expected an object with an id.")
+        fields = dict(update)
+        task_id = fields.pop("id")
+        try:
+            changes.setdefault(task_id, {}).update(
+                task_fields(fields, partial=True)
+            )
+        except ValueError as e:
+            abort(400, f"Update {index}: {e}")
+
+    # Load every task and check ownership in a single query
+    tasks = _owned_tasks_query().filter(Task.id.in_(changes)).all()
+    missing = set(changes) - {task.id for task in tasks}
+    if missing:
+        abort(404, f"Tasks not found: {sorted(missing)}.")
+
+    for task in tasks:
+        fields = changes[task.id]
+        change_task_status(task, fields.pop("status", task.status))
+        for name, value in fields.items():
+            setattr(task, name, value)
+    for project_id in {task.project_id for task in tasks}:
+        bump_project_version(project_id)
+    db.session.commit()
+    _forget_cards(changes)
+    for task in tasks:
+        publish_task("task_updated", task)
+    return jsonify(tasks=[task_to_dict(task) for task in tasks])
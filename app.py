@@ -1,7 +1,48 @@
 # app.py
 from settings import Config
-from models import User, Project, Task
+from models import User, Project, Task, TASK_STATUSES
+from access import owned_project, owned_task
+from api import api
+from bulk import (
+    TASK_FORMATS,
+    TaskImportError,
+    export_tasks,
+    import_tasks,
+    read_rows,
+)
+from db_pool import install_pool_metrics, pool_stats
+from digest import due_digest
+from events import (
+    make_broker,
+    project_channel,
+    publish,
+    publish_task,
+    publish_task_deleted,
+)
+from instrumentation import init_instrumentation
+from cache import LRUCache, make_cache
+from compression import CompressionMiddleware
+from conditional import conditional_page
+from fragment_cache import FragmentCache, task_version
+from hashing import HashingBusy, needs_rehash
+from ratelimit import make_limiter
+from queries import (
+    bump_project_version,
+    change_task_status,
+    column_page,
+    dashboard_version,
+    delete_project_tasks,
+    empty_rollup,
+    kanban_columns,
+    normalise_sort,
+    project_rollups,
+    rebalance_crowded_columns,
+)
 from db import db
+from search import search_tasks
+from static_assets import init_static_assets
+from user_cache import UserCache
+from warmup import boot_times, install_bytecode_cache
 from flask_login import (
     LoginManager,
     login_user,
@@ -9,8 +50,27 @@ from flask_login import (
     login_required,
     current_user,
 )
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import (
+    Flask,
+    Response,
+    abort,
+    flash,
+    jsonify,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    session,
+    stream_with_context,
+    url_for,
+)
+import csv
+import json
+import time
 from datetime import datetime
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -27,9 +87,38 @@ app = Flask(__name__, static_folder="assets")
 # The dotenv will handle local environment variables.
 app.config.from_object(Config)
 
+# Share compiled templates between workers and restarts
+if app.config["TEMPLATE_CACHE_DIR"] != "":
+    install_bytecode_cache(app, app.config["TEMPLATE_CACHE_DIR"])
+
+# Link to and serve fingerprinted assets when they have been built
+init_static_assets(app, app.config["STATIC_MANIFEST"])
+
+# Trust X-Forwarded-For from the configured number of proxies
+if app.config["TRUSTED_PROXY_COUNT"]:
+    app.wsgi_app = ProxyFix(
+        app.wsgi_app, x_for=app.config["TRUSTED_PROXY_COUNT"]
+    )
+
+# Compress HTML, JSON and other text responses on the way out
+if app.config["COMPRESSION_ENABLED"]:
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config["COMPRESSION_MIN_SIZE"],
+        cache=(
+            LRUCache(maxsize=app.config["COMPRESSION_CACHE_SIZE"])
+            if app.config["COMPRESSION_CACHE_SIZE"] else None
+        ),
+    )
+
 
 # Initialize SQLAlchemy
 db.init_app(app)
+with app.app_context():
+    install_pool_metrics(db.engine)
+    # Opt-in request, query and template timings
+    if app.config["METRICS_ENABLED"]:
+        init_instrumentation(app, db.engine)
 
 
 # Initialize Flask-Login (will be used later for user management)
@@ -44,6 +133,70 @@ login_manager.login_message = "Please log in to access this page."
 login_manager.login_message_category = "warning"
 
 
+# Cache of logged in users, so the user loader can skip the database
+user_cache = UserCache(
+    make_cache(
+        app.config["USER_CACHE_URL"],
+        prefix="user:",
+        maxsize=app.config["USER_CACHE_SIZE"],
+        ttl=app.config["USER_CACHE_TTL"],
+    )
+)
+
+
+# Cache of rendered kanban cards, keyed by task id and version
+card_cache = FragmentCache(
+    make_cache(
+        app.config["FRAGMENT_CACHE_URL"],
+        prefix="card:",
+        maxsize=app.config["FRAGMENT_CACHE_SIZE"],
+    ),
+    "task_card.html",
+    "task",
+)
+# Shared with the API blueprint, which also changes tasks
+app.extensions["card_cache"] = card_cache
+
+
+# Live board updates, published by every route that changes a board
+if app.config["LIVE_UPDATES"]:
+    with app.app_context():
+        app.extensions["events"] = make_broker(
+            app.config["EVENTS_BROKER"],
+            db.engine,
+            maxsize=app.config["EVENTS_QUEUE_SIZE"],
+        )
+
+
+# JSON API for scripts and the kanban board, under /api/v1
+app.register_blueprint(api)
+
+
+@app.template_global()
+def render_task_card(task):
+    """
+    Renders a kanban card for a task, reusing the cached markup
+    while the task is unchanged.
+    """
+    return card_cache.render(app.jinja_env, task, task_version(task))
+
+
+# Login attempt limits, checked before any database or hashing work
+login_limiters = {
+    scope: make_limiter(
+        app.config["RATE_LIMIT_STORAGE_URL"],
+        prefix=f"login:{scope}:",
+        limit=limit,
+        window=app.config["LOGIN_RATE_WINDOW"],
+    )
+    for scope, limit in (
+        ("ip", app.config["LOGIN_RATE_LIMIT_PER_IP"]),
+        ("username", app.config["LOGIN_RATE_LIMIT_PER_USERNAME"]),
+    )
+    if limit
+}
+
+
 # User Loader
 @login_manager.user_loader
 def load_user(user_id):
@@ -51,7 +204,30 @@ def load_user(user_id):
     Given a user ID, return the corresponding User object.
     This function is required by Flask-Login.
     """
-    return User.query.get(int(user_id))
+    if not app.config["USER_CACHE_TTL"]:
+        return db.session.get(User, int(user_id))
+
+    # Set when the user changes their profile, so this session never
+    # sees a copy cached before by another worker
+    version = session.get("user_cache_version")
+    user = user_cache.get(user_id, version)
+    if user is None:
+        user = db.session.get(User, int(user_id))
+        if user is not None:
+            user_cache.store(user, version)
+    return user
+
+
+# Password hashing is capped, so turn requests away when it is saturated
+@app.errorhandler(HashingBusy)
+def hashing_busy(error):
+    """
+    Asks the user to retry when too many password hashes are running.
+    """
+    flash("The server is busy. Please try again in a moment.", "warning")
+    response = redirect(request.path)
+    response.headers["Retry-After"] = "5"
+    return response
 
 
 # --- ROUTES ---
@@ -73,10 +249,44 @@ def index():
 @login_required
 def dashboard():
     """
-    Renders the user's dashboard with a list of their projects.
-    """
-    projects = Project.query.filter_by(user_id=current_user.id).all()
-    return render_template("dashboard.html", projects=projects)
+    Renders the user's dashboard with a list of their projects,
+    a task summary for each one, and their overdue and due soon tasks.
+    """
+    def render():
+        projects = Project.query.filter_by(
+            user_id=current_user.id, deleting=False
+        ).all()
+        # One aggregate query covers every project card
+        rollups = project_rollups(current_user.id)
+        # Kept up to date by the worker, so no task scan is needed here
+        overdue, due_soon, overdue_count, due_soon_count = due_digest(
+            current_user.id, app.config["DUE_DIGEST_LIMIT"]
+        )
+        return render_template(
+            "dashboard.html",
+            projects=projects,
+            rollups=rollups,
+            empty_rollup=empty_rollup(),
+            overdue=overdue,
+            due_soon=due_soon,
+            overdue_count=overdue_count,
+            due_soon_count=due_soon_count,
+        )
+
+    # Overdue counts change at midnight even if nothing is edited
+    today = datetime.utcnow().replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    count, versions, updated_at, digest_size, digest_changed = (
+        dashboard_version(current_user.id)
+    )
+    # No Last-Modified: deleting a project moves no timestamp, so only
+    # the ETag can tell a client its copy is stale
+    return conditional_page(
+        (count, versions, updated_at, digest_size, digest_changed, today),
+        None,
+        render,
+    )
 
 
 # Add Project route
@@ -107,74 +317,174 @@ def add_project():
 # Project Details route
 @app.route("/project/<int:project_id>", methods=["GET"])
 @login_required
-def project_details(project_id):
+@owned_project("view this project")
+def project_details(project):
     """
     Renders the details for a specific project, including its tasks.
     Also handles sorting and filtering of tasks.
     """
-    project = Project.query.get_or_404(project_id)
-
-    # Make sure the current user has access to this project
-    if project.user_id != current_user.id:
-        flash("You do not have permission to view this project.", "danger")
-        return redirect(url_for("dashboard"))
-
     # Get sorting parameters from the URL
-    sort_by = request.args.get("sort_by", "created_at")
-    sort_order = request.args.get("sort_order", "desc")
-
-    # Get all tasks for the project and then sort them
-    all_tasks = project.tasks.all()
+    sort_by, sort_order = normalise_sort(
+        request.args.get("sort_by", "created_at"),
+        request.args.get("sort_order", "desc"),
+    )
 
-    # Sort the tasks based on the 'sort_by' and 'sort_order' parameter
-    if sort_by == "due_date":
-        all_tasks.sort(
-            key=lambda x: (x.due_date is None, x.due_date),
-            reverse=(sort_order == "desc"),
+    def render():
+        # Each kanban column is sorted, filtered and paged by the database
+        columns = kanban_columns(
+            project.id, sort_by, sort_order, app.config["KANBAN_PAGE_SIZE"]
         )
-    elif sort_by == "priority":
-        priority_order = {"High": 1, "Medium": 2, "Low": 3}
-        all_tasks.sort(
-            key=lambda x: priority_order.get(x.priority, 99),
-            reverse=(sort_order == "desc"),
+        return render_template(
+            "project_details.html",
+            project=project,
+            columns=columns,
+            sort_by=sort_by,
+            sort_order=sort_order,
         )
-    else:
-        # Default to sorting by creation date
-        all_tasks.sort(key=lambda x: x.created_at,
-                       reverse=(sort_order == "desc"))
 
-    # Separate tasks by status for the kanban view
-    tasks_todo = [t for t in all_tasks if t.status == "To Do"]
-    tasks_in_progress = [t for t in all_tasks if t.status == "In Progress"]
-    tasks_done = [t for t in all_tasks if t.status == "Done"]
+    # The project's version covers its tasks, so no task query is
+    # needed to answer a revalidation
+    return conditional_page(
+        (project.version, app.config["KANBAN_PAGE_SIZE"]),
+        project.updated_at,
+        render,
+    )
+
+
+# Project Tasks route
+@app.route("/project/<int:project_id>/tasks", methods=["GET"])
+@login_required
+@owned_project("view this project", forbidden=True)
+def project_tasks(project):
+    """
+    Renders the next page of cards for one kanban column.
+    Pages are chained by the cursor returned with the previous page.
+    """
+    status = request.args.get("status")
+    if status not in TASK_STATUSES:
+        abort(400)
+
+    sort_by, sort_order = normalise_sort(
+        request.args.get("sort_by", "created_at"),
+        request.args.get("sort_order", "desc"),
+    )
+    try:
+        tasks, next_cursor = column_page(
+            project.id,
+            status,
+            sort_by,
+            sort_order,
+            app.config["KANBAN_PAGE_SIZE"],
+            cursor=request.args.get("cursor"),
+        )
+    except ValueError:
+        abort(400)
 
     return render_template(
-        "project_details.html",
+        "task_column_page.html",
         project=project,
-        tasks_todo=tasks_todo,
-        tasks_in_progress=tasks_in_progress,
-        tasks_done=tasks_done,
+        status=status,
+        tasks=tasks,
+        next_cursor=next_cursor,
         sort_by=sort_by,
         sort_order=sort_order,
     )
 
 
+# Project Events route
+@app.route("/project/<int:project_id>/events", methods=["GET"])
+@login_required
+@owned_project("view this project")
+def project_events(project):
+    """
+    Streams changes to a project's board as Server-Sent Events, so open
+    boards apply them instead of reloading the page.
+    Each stream ends after EVENTS_STREAM_TIMEOUT seconds and the browser
+    reconnects, so no stream holds a worker indefinitely.
+    """
+    broker = app.extensions.get("events")
+    if broker is None:
+        abort(404)
+    channel = project_channel(project.id)
+    heartbeat = app.config["EVENTS_HEARTBEAT"]
+    deadline = time.monotonic() + app.config["EVENTS_STREAM_TIMEOUT"]
+
+    # Runs after the request context and its database session are gone,
+    # so the stream holds no pooled connection
+    def stream():
+        with broker.subscribe(channel) as subscription:
+            yield "retry: 2000\n\n"
+            while time.monotonic() < deadline:
+                event = subscription.get(timeout=heartbeat)
+                if subscription.overflowed:
+                    # Too far behind to catch up with deltas
+                    yield "event: reload\ndata: {}\n\n"
+                    return
+                if event is None:
+                    yield ": keep-alive\n\n"
+                else:
+                    yield f"data: {json.dumps(event)}\n\n"
+
+    return Response(
+        stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Task Card route
+@app.route("/task/<int:task_id>/card", methods=["GET"])
+@login_required
+@owned_task("view this task", forbidden=True)
+def task_card(task):
+    """
+    Renders a single kanban card, for boards applying live updates.
+    """
+    return render_task_card(task)
+
+
+# Search route
+@app.route("/search", methods=["GET"])
+@login_required
+def search():
+    """
+    Searches the current user's tasks and projects.
+    Results are ranked by relevance and split into pages.
+    """
+    terms = request.args.get("q", "").strip()
+    page = request.args.get("page", 1, type=int)
+    page = max(page, 1)
+
+    results, has_next = [], False
+    if terms:
+        results, has_next = search_tasks(
+            current_user.id, terms, page, app.config["SEARCH_PAGE_SIZE"]
+        )
+
+    return render_template(
+        "search.html",
+        terms=terms,
+        results=results,
+        page=page,
+        has_next=has_next,
+    )
+
+
 # Edit Project route
 @app.route("/edit_project/<int:project_id>", methods=["GET", "POST"])
 @login_required
-def edit_project(project_id):
+@owned_project("edit this project")
+def edit_project(project):
     """
     Handles editing an existing project.
     """
-    project = Project.query.get_or_404(project_id)
-    if project.user_id != current_user.id:
-        flash("You do not have permission to edit this project.", "danger")
-        return redirect(url_for("dashboard"))
-
     if request.method == "POST":
         project.name = request.form.get("name")
         project.description = request.form.get("description")
+        bump_project_version(project.id)
         db.session.commit()
+        publish(project.id, "project_updated", name=project.name,
+                description=project.description)
         flash("Project updated successfully!", "success")
         return redirect(url_for("project_details", project_id=project.id))
 
@@ -184,21 +494,27 @@ def edit_project(project_id):
 # Delete Project route
 @app.route("/delete_project/<int:project_id>", methods=["POST"])
 @login_required
-def delete_project(project_id):
+@owned_project("delete this project")
+def delete_project(project):
     """
     Handles deleting a project.
     """
-    project = Project.query.get_or_404(project_id)
-    if project.user_id != current_user.id:
-        flash("You do not have permission to delete this project.", "danger")
+    # Very large projects are hidden at once and left to the worker,
+    # which deletes them in batches and resumes after any restart
+    threshold = app.config["PROJECT_DELETE_BACKGROUND_THRESHOLD"]
+    if threshold and project.tasks.count() > threshold:
+        project.deleting = True
+        db.session.commit()
+        publish(project.id, "project_deleted")
+        flash("Project is being deleted. This may take a moment.", "info")
         return redirect(url_for("dashboard"))
 
-    # Delete all tasks associated with the project first
-    for task in project.tasks.all():
-        db.session.delete(task)
-
+    # Delete all tasks associated with the project in one statement
+    project_id = project.id
+    delete_project_tasks(project_id)
     db.session.delete(project)
     db.session.commit()
+    publish(project_id, "project_deleted")
     flash("Project deleted successfully!", "success")
     return redirect(url_for("dashboard"))
 
@@ -206,17 +522,11 @@ def delete_project(project_id):
 # Add Task route
 @app.route("/add_task/<int:project_id>", methods=["GET", "POST"])
 @login_required
-def add_task(project_id):
+@owned_project("add tasks to this project")
+def add_task(project):
     """
     Handles adding a new task to a project.
     """
-    project = Project.query.get_or_404(project_id)
-    if project.user_id != current_user.id:
-        flash(
-            "You do not have permission to add tasks to this project", "danger"
-        )
-        return redirect(url_for("dashboard"))
-
     if request.method == "POST":
         title = request.form.get("title")
         description = request.form.get("description")
@@ -240,30 +550,95 @@ def add_task(project_id):
             project_id=project.id,
         )
         db.session.add(new_task)
+        bump_project_version(project.id)
         db.session.commit()
+        publish_task("task_created", new_task)
         flash("Task added successfully!", "success")
         return redirect(url_for("project_details", project_id=project.id))
 
     return render_template("add_task.html", project=project)
 
 
+# Import Tasks route
+@app.route("/project/<int:project_id>/import", methods=["GET", "POST"])
+@login_required
+@owned_project("import tasks into this project")
+def import_project_tasks(project):
+    """
+    Handles bulk importing tasks into a project from a CSV or NDJSON file.
+    """
+    if request.method == "POST":
+        upload = request.files.get("file")
+        fmt = request.form.get("format")
+        if not upload or not upload.filename:
+            flash("Please choose a file to import.", "danger")
+            return redirect(url_for("import_project_tasks",
+                                    project_id=project.id))
+        if fmt not in TASK_FORMATS:
+            flash("Please choose CSV or NDJSON.", "danger")
+            return redirect(url_for("import_project_tasks",
+                                    project_id=project.id))
+
+        try:
+            imported = import_tasks(
+                project.id,
+                read_rows(upload.stream, fmt),
+                app.config["TASK_IMPORT_BATCH_SIZE"],
+            )
+        except TaskImportError as e:
+            for message in e.errors:
+                flash(message, "danger")
+            return redirect(url_for("import_project_tasks",
+                                    project_id=project.id))
+        except (UnicodeDecodeError, csv.Error):
+            flash("The file could not be read.", "danger")
+            return redirect(url_for("import_project_tasks",
+                                    project_id=project.id))
+
+        publish(project.id, "tasks_imported", count=imported)
+        flash(f"{imported} tasks imported successfully!", "success")
+        return redirect(url_for("project_details", project_id=project.id))
+
+    return render_template("import_tasks.html", project=project)
+
+
+# Export Tasks route
+@app.route("/project/<int:project_id>/export.<fmt>", methods=["GET"])
+@login_required
+@owned_project("export this project")
+def export_project_tasks(project, fmt):
+    """
+    Streams all of a project's tasks as a CSV or NDJSON download.
+    """
+    if fmt not in TASK_FORMATS:
+        abort(404)
+
+    chunks = export_tasks(
+        project.id, fmt, app.config["TASK_EXPORT_CHUNK_SIZE"]
+    )
+    return Response(
+        stream_with_context(chunks),
+        mimetype=TASK_FORMATS[fmt],
+        headers={
+            "Content-Disposition":
+                f'attachment; filename="project-{project.id}-tasks.{fmt}"'
+        },
+    )
+
+
 # Edit Task route
 @app.route("/edit_task/<int:task_id>", methods=["GET", "POST"])
 @login_required
-def edit_task(task_id):
+@owned_task("edit this task")
+def edit_task(task):
     """
     Handles editing a task.
     """
-    task = Task.query.get_or_404(task_id)
-    if task.project.user_id != current_user.id:
-        flash("You do not have permission to edit this task.", "danger")
-        return redirect(url_for("dashboard"))
-
     if request.method == "POST":
         task.title = request.form.get("title")
         task.description = request.form.get("description")
         due_date_str = request.form.get("due_date")
-        task.status = request.form.get("status")
+        change_task_status(task, request.form.get("status"))
         task.priority = request.form.get("priority")
 
         task.due_date = (
@@ -271,9 +646,12 @@ def edit_task(task_id):
                 due_date_str, "%Y-%m-%d") if due_date_str else None
         )
 
+        bump_project_version(task.project_id)
         db.session.commit()
+        card_cache.invalidate(task.id)
+        publish_task("task_updated", task)
         flash("Task updated successfully!", "success")
-        return redirect(url_for("project_details", project_id=task.project.id))
+        return redirect(url_for("project_details", project_id=task.project_id))
 
     return render_template("edit_task.html", task=task)
 
@@ -281,22 +659,53 @@ def edit_task(task_id):
 # Delete Task route
 @app.route("/delete_task/<int:task_id>", methods=["POST"])
 @login_required
-def delete_task(task_id):
+@owned_task("delete this task")
+def delete_task(task):
     """
     Handles deleting a task.
     """
-    task = Task.query.get_or_404(task_id)
-    if task.project.user_id != current_user.id:
-        flash("You do not have permission to delete this task.", "danger")
-        return redirect(url_for("dashboard"))
-
-    project_id = task.project.id
+    project_id = task.project_id
+    task_id = task.id
     db.session.delete(task)
+    bump_project_version(project_id)
     db.session.commit()
+    card_cache.invalidate(task_id)
+    publish_task_deleted(project_id, task_id)
     flash("Task deleted successfully!", "success")
     return redirect(url_for("project_details", project_id=project_id))
 
 
+# Rebalance Positions command
+@app.cli.command("rebalance-positions")
+def rebalance_positions_command():
+    """
+    Respace the manual order of every kanban column whose positions
+    are close to running out of room between them.
+    """
+    print(f"Rebalanced {rebalance_crowded_columns()} columns.")
+
+
+# Health route
+@app.route("/health")
+def health():
+    """
+    Reports whether the database is reachable, with connection pool
+    statistics and this worker's boot timings, as JSON for uptime
+    checks and monitoring.
+    """
+    try:
+        db.session.execute(text("SELECT 1"))
+        database = "ok"
+    except SQLAlchemyError:
+        database = "unavailable"
+    body = {
+        "database": database,
+        "pool": pool_stats(db.engine),
+        "boot": boot_times,
+    }
+    return jsonify(body), 200 if database == "ok" else 503
+
+
 # Register route
 @app.route("/register", methods=["GET", "POST"])
 def register():
@@ -352,9 +761,31 @@ def login():
     if request.method == "POST":
         username = request.form.get("username")
         password = request.form.get("password")
+
+        # Reject floods of attempts before they reach the database
+        for scope, key in (("ip", request.remote_addr),
+                           ("username", (username or "").lower())):
+            limiter = login_limiters.get(scope)
+            if limiter and not limiter.hit(key):
+                flash(
+                    "Too many login attempts. Please try again later.",
+                    "danger",
+                )
+                response = make_response(render_template("login.html"), 429)
+                response.headers["Retry-After"] = str(
+                    app.config["LOGIN_RATE_WINDOW"]
+                )
+                return response
+
         user = User.query.filter_by(username=username).first()
 
         if user and user.check_password(password):
+            # Upgrade hashes made with an older method or cost
+            if needs_rehash(user.password_hash):
+                user.set_password(password)
+                db.session.commit()
+            if "username" in login_limiters:
+                login_limiters["username"].reset(username.lower())
             login_user(user)
             flash("Login successful!", "success")
             return redirect(url_for("dashboard"))
@@ -433,6 +864,9 @@ def edit_profile():
         current_user.first_name = new_first_name
         current_user.last_name = new_last_name
         db.session.commit()
+        session["user_cache_version"] = user_cache.invalidate(
+            current_user.id
+        )
         flash("Profile updated successfully!", "success")
         return redirect(url_for("profile"))
 
@@ -468,6 +902,9 @@ def change_password():
 
         current_user.set_password(new_password)
         db.session.commit()
+        session["user_cache_version"] = user_cache.invalidate(
+            current_user.id
+        )
         flash("Password updated successfully!", "success")
         return redirect(url_for("profile"))
 
@@ -0,0 +1,238 @@
+/* Kanban board behaviour for the project details page */
+
+/* Fetch the next page of a column and put it where the button was */
+document.addEventListener("click", function (event) {
+  const button = event.target.closest(".load-more-tasks");
+  if (!button) {
+    return;
+  }
+  button.disabled = true;
+  fetch(button.dataset.url, { credentials: "same-origin" })
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error("Failed to load tasks: " + response.status);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      button.closest(".load-more-container").outerHTML = html;
+    })
+    .catch(function (error) {
+      console.error(error);
+      button.disabled = false;
+    });
+});
+
+/* Drag cards between and within columns, saving each move with one
+   small request instead of the edit form and a full page reload */
+let draggedCard = null;
+let dragOrigin = null;
+
+/* The card the dragged card should sit above, or null for the end */
+function cardBelow(column, y) {
+  const cards = column.querySelectorAll(".task-card:not(.dragging)");
+  for (const card of cards) {
+    const box = card.getBoundingClientRect();
+    if (y < box.top + box.height / 2) {
+      return card;
+    }
+  }
+  return null;
+}
+
+/* Put a card above `before`, or after the last card of the column */
+function placeCard(column, card, before) {
+  if (before) {
+    before.before(card);
+    return;
+  }
+  const loadMore = column.querySelector(".load-more-container");
+  if (loadMore) {
+    loadMore.before(card);
+  } else {
+    column.appendChild(card);
+  }
+}
+
+document.addEventListener("dragstart", function (event) {
+  const card = event.target.closest(".task-card");
+  if (!card) {
+    return;
+  }
+  draggedCard = card;
+  dragOrigin = { parent: card.parentNode, next: card.nextSibling };
+  card.classList.add("dragging");
+  event.dataTransfer.effectAllowed = "move";
+  event.dataTransfer.setData("text/plain", card.dataset.taskId);
+});
+
+document.addEventListener("dragover", function (event) {
+  const column = event.target.closest(".kanban-column");
+  if (!column || !draggedCard) {
+    return;
+  }
+  event.preventDefault();
+  placeCard(column, draggedCard, cardBelow(column, event.clientY));
+});
+
+document.addEventListener("drop", function (event) {
+  const column = event.target.closest(".kanban-column");
+  if (!column || !draggedCard) {
+    return;
+  }
+  event.preventDefault();
+  const card = draggedCard;
+  const origin = dragOrigin;
+  dragOrigin = null;
+  if (card.parentNode === origin.parent && card.nextSibling === origin.next) {
+    return;
+  }
+  const next = card.nextElementSibling;
+  const before = next && next.classList.contains("task-card") ? next : null;
+
+  fetch(card.dataset.moveUrl, {
+    method: "PATCH",
+    credentials: "same-origin",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      status: column.dataset.status,
+      before_id: before ? Number(before.dataset.taskId) : null,
+    }),
+  })
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error("Failed to move task: " + response.status);
+      }
+      return response.json();
+    })
+    .then(function (moved) {
+      card.dataset.status = moved.status;
+      card.dataset.position = moved.position;
+    })
+    .catch(function (error) {
+      console.error(error);
+      origin.parent.insertBefore(card, origin.next);
+    });
+});
+
+document.addEventListener("dragend", function () {
+  if (draggedCard) {
+    draggedCard.classList.remove("dragging");
+  }
+  // Dropped outside the board, so put the card back
+  if (dragOrigin) {
+    dragOrigin.parent.insertBefore(draggedCard, dragOrigin.next);
+  }
+  draggedCard = null;
+  dragOrigin = null;
+});
+
+/* Live updates: apply changes made in other tabs and by other people
+   as they are streamed, instead of reloading the whole board */
+function columnFor(board, status) {
+  for (const column of board.querySelectorAll(".kanban-column")) {
+    if (column.dataset.status === status) {
+      return column;
+    }
+  }
+  return null;
+}
+
+function findCard(board, taskId) {
+  return board.querySelector('.task-card[data-task-id="' + taskId + '"]');
+}
+
+/* In manual order, the first card placed after `position`; in any
+   other order new arrivals go to the end of the loaded cards */
+function cardAfter(board, column, position) {
+  if (board.dataset.sortBy !== "manual") {
+    return null;
+  }
+  for (const card of column.querySelectorAll(".task-card")) {
+    if (Number(card.dataset.position) > position) {
+      return card;
+    }
+  }
+  return null;
+}
+
+/* Fetch a task's card and put it in its column, replacing any copy */
+function showCard(board, event) {
+  fetch(event.card_url, { credentials: "same-origin" })
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error("Failed to load task: " + response.status);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      const holder = document.createElement("div");
+      holder.innerHTML = html.trim();
+      const card = holder.firstElementChild;
+      const existing = findCard(board, event.task_id);
+      const column = columnFor(board, event.status);
+      if (existing && existing === draggedCard) {
+        return;
+      }
+      // A move within the same column in manual order is a reorder
+      const reordered = board.dataset.sortBy === "manual" &&
+        existing && existing.dataset.position !== card.dataset.position;
+      if (existing && !reordered &&
+          existing.closest(".kanban-column") === column) {
+        existing.replaceWith(card);
+        return;
+      }
+      if (existing) {
+        existing.remove();
+      }
+      if (column) {
+        placeCard(column, card, cardAfter(board, column, event.position));
+      }
+    })
+    .catch(function (error) {
+      console.error(error);
+    });
+}
+
+function applyEvent(board, event) {
+  switch (event.type) {
+    case "task_created":
+    case "task_updated":
+    case "task_moved":
+      showCard(board, event);
+      break;
+    case "task_deleted": {
+      const card = findCard(board, event.task_id);
+      if (card && card !== draggedCard) {
+        card.remove();
+      }
+      break;
+    }
+    case "project_updated":
+      document.getElementById("project-name").textContent = event.name;
+      document.getElementById("project-description").textContent =
+        event.description || "";
+      break;
+    case "project_deleted":
+      window.location.href = board.dataset.dashboardUrl;
+      break;
+    default:
+      /* Anything else, such as an import, needs the full board */
+      window.location.reload();
+  }
+}
+
+(function () {
+  const board = document.querySelector(".kanban-board[data-events-url]");
+  if (!board || !window.EventSource) {
+    return;
+  }
+  const source = new EventSource(board.dataset.eventsUrl);
+  source.onmessage = function (message) {
+    applyEvent(board, JSON.parse(message.data));
+  };
+  /* Sent when this board fell too far behind to catch up */
+  source.addEventListener("reload", function () {
+    window.location.reload();
+  });
+})();
@@ -0,0 +1,444 @@
+# benchmark.py
+"""
+Load-testing benchmark for CheckMate's core routes.
+
+Seeds a database with synthetic users, projects and tasks, then drives
+the dashboard, the project details page in every sort mode, add_task
+and delete_project, and reports latency percentiles, query counts and
+throughput as JSON.
+
+Runs in-process through the Flask test client by default, or against
+a running server (e.g. local gunicorn) with --url.
+
+Seeding drops every table first, so databases on other hosts are only
+seeded with --force.
+
+    python benchmark.py --database-url sqlite:////tmp/bench.db \\
+        --projects 1000 --tasks 1000000 --requests 200
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BENCH_PASSWORD = "benchmark-password"
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "::1")
+SORT_MODES = [
+    (sort_by, sort_order)
+    for sort_by in ("created_at", "due_date", "priority")
+    for sort_order in ("asc", "desc")
+] + [("manual", "asc")]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--database-url",
+                        default="sqlite:////tmp/checkmate-benchmark.db",
+                        help="database to seed and benchmark; it is "
+                             "emptied first unless --skip-seed is given")
+    parser.add_argument("--force", action="store_true",
+                        help="allow seeding a database that is not on "
+                             "this machine")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--projects", type=int, default=100,
+                        help="projects in total, shared between users")
+    parser.add_argument("--tasks", type=int, default=100000,
+                        help="tasks in total, shared between projects")
+    parser.add_argument("--delete-tasks", type=int, default=1000,
+                        help="tasks in each project deleted by the "
+                             "delete_project scenario")
+    parser.add_argument("--requests", type=int, default=100,
+                        help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="concurrent clients per scenario")
+    parser.add_argument("--url", help="benchmark a running server at this "
+                        "base URL instead of the in-process test client")
+    parser.add_argument("--streams", type=int, default=0,
+                        help="live update streams held open during the "
+                             "run (--url only; the server needs "
+                             "LIVE_UPDATES)")
+    parser.add_argument("--skip-seed", action="store_true",
+                        help="reuse the data from a previous run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here "
+                        "as well as to stdout")
+    return parser.parse_args(argv)
+
+
+def is_local_database(database_url):
+    """
+    Whether a database URL points at SQLite or a server on this machine,
+    reached over TCP or a Unix socket.
+    """
+    from sqlalchemy.engine import make_url
+
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        return True
+    host = url.host or url.query.get("host")
+    return not host or host in LOCAL_HOSTS or host.startswith("/")
+
+
+def is_error(status, location):
+    """
+    Whether a response failed, counting a redirect to the login page,
+    as sent when the session has been lost, as a failure too.
+    """
+    if status >= 400:
+        return True
+    return bool(location) and urllib.parse.urlsplit(location).path == "/login"
+
+
+def seed(db, args):
+    """
+    Reset the database and fill it with synthetic data using batched
+    inserts. Returns nothing; the benchmark user is 'bench0'.
+    """
+    from sqlalchemy import insert
+    from models import User, Project, Task, PRIORITY_RANKS, TASK_STATUSES
+
+    rng = random.Random(args.seed)
+    db.drop_all()
+    db.create_all()
+
+    user = User(username="bench", email="bench@example.com")
+    user.set_password(BENCH_PASSWORD)
+    db.session.execute(insert(User), [
+        {
+            "username": f"bench{i}",
+            "email": f"bench{i}@example.com",
+            "first_name": "Bench",
+            "last_name": str(i),
+            "password_hash": user.password_hash,
+        }
+        for i in range(args.users)
+    ])
+    user_ids = [u.id for u in User.query.order_by(User.id)]
+
+    db.session.execute(insert(Project), [
+        {
+            "name": f"Project {i}",
+            "description": "Benchmark project",
+            "user_id": user_ids[i % len(user_ids)],
+        }
+        for i in range(args.projects)
+    ])
+    project_ids = [p.id for p in Project.query.order_by(Project.id)]
+
+    now = datetime.utcnow()
+    priorities = list(PRIORITY_RANKS)
+    batch = []
+    for i in range(args.tasks):
+        priority = rng.choice(priorities)
+        batch.append({
+            "title": f"Task {i}",
+            "description": "Benchmark task with a short description",
+            "status": rng.choice(TASK_STATUSES),
+            "priority": priority,
+            "priority_rank": PRIORITY_RANKS[priority],
+            "due_date": rng.choice(
+                [None, now + timedelta(days=rng.randint(-30, 60))]),
+            "created_at": now - timedelta(minutes=i),
+            "project_id": project_ids[i % len(project_ids)],
+        })
+        if len(batch) == 10000:
+            db.session.execute(insert(Task), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Task), batch)
+    db.session.commit()
+
+
+def create_delete_victims(db, user_id, count, tasks_each):
+    """
+    Create projects for the delete_project scenario to remove.
+    """
+    from sqlalchemy import insert
+    from models import Project, Task
+
+    ids = []
+    for i in range(count):
+        project = Project(name=f"Delete me {i}", user_id=user_id)
+        db.session.add(project)
+        db.session.flush()
+        ids.append(project.id)
+        db.session.execute(insert(Task), [
+            {"title": f"Doomed {j}", "project_id": project.id,
+             "status": "To Do", "priority": "Medium", "priority_rank": 2}
+            for j in range(tasks_each)
+        ])
+    db.session.commit()
+    return ids
+
+
+class QueryCounter:
+    """
+    Counts SQL statements executed by an engine, per thread.
+    """
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self._local = threading.local()
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self._local.count = getattr(self._local, "count", 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, "count", 0)
+
+
+class TestClientDriver:
+    """
+    Sends requests through the Flask test client, one client per thread.
+    The driver logs in once and every client shares that session, so
+    new threads do not run into the login rate limit.
+    """
+
+    def __init__(self, app, counter):
+        self.app = app
+        self.counter = counter
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._session = None
+
+    def _session_cookie(self):
+        with self._lock:
+            if self._session is None:
+                client = self.app.test_client()
+                client.post("/login", data={
+                    "username": "bench0", "password": BENCH_PASSWORD})
+                cookie = client.get_cookie(
+                    self.app.config["SESSION_COOKIE_NAME"])
+                if cookie is None:
+                    sys.exit("Could not log in as bench0")
+                self._session = cookie.value
+        return self._session
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self.app.test_client()
+            client.set_cookie(self.app.config["SESSION_COOKIE_NAME"],
+                              self._session_cookie())
+            self._local.client = client
+        return client
+
+    def request(self, method, path, data=None):
+        client = self._client()
+        self.counter.reset()
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        elapsed = time.perf_counter() - started
+        error = is_error(response.status_code, response.location)
+        return error, elapsed, self.counter.count
+
+
+class HTTPDriver:
+    """
+    Sends requests to a running server, one opener per thread sharing a
+    cookie jar, so the driver logs in only once. Query counts are not
+    available in this mode.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self._local = threading.local()
+        self._cookies = http.cookiejar.CookieJar()
+        self._lock = threading.Lock()
+        self._logged_in = False
+
+    def _opener(self):
+        opener = getattr(self._local, "opener", None)
+        if opener is None:
+            opener = urllib.request.build_opener(
+                urllib.request.HTTPCookieProcessor(self._cookies))
+            self._local.opener = opener
+        with self._lock:
+            if not self._logged_in:
+                self._send(opener, "POST", "/login", {
+                    "username": "bench0", "password": BENCH_PASSWORD})
+                self._logged_in = True
+        return opener
+
+    def _send(self, opener, method, path, data):
+        """
+        Send a request, following redirects, and return the final
+        status and URL.
+        """
+        body = urllib.parse.urlencode(data).encode() if data else None
+        request = urllib.request.Request(
+            self.base_url + path, data=body, method=method)
+        try:
+            with opener.open(request) as response:
+                response.read()
+                return response.status, response.geturl()
+        except urllib.error.HTTPError as e:
+            return e.code, e.geturl()
+
+    def request(self, method, path, data=None):
+        opener = self._opener()
+        started = time.perf_counter()
+        status, url = self._send(opener, method, path, data)
+        elapsed = time.perf_counter() - started
+        return is_error(status, url), elapsed, None
+
+    def hold_stream(self, path, stop):
+        """
+        Read a streamed response on a thread of its own until stop is
+        set, reconnecting whenever the server ends it, so it keeps
+        occupying whatever serves it, as an open browser tab would.
+        """
+        def reader():
+            opener = self._opener()
+            while not stop.is_set():
+                try:
+                    with opener.open(self.base_url + path) as response:
+                        while not stop.is_set() and response.read1(1024):
+                            pass
+                except OSError:
+                    time.sleep(0.1)
+
+        thread = threading.Thread(target=reader, daemon=True)
+        thread.start()
+        return thread
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1,
+                round(fraction * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+def run_scenario(driver, name, requests, concurrency):
+    """
+    Send each (method, path, data) request and summarise the results.
+    """
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda r: driver.request(*r), requests))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed for _, elapsed, _ in results)
+    queries = [count for _, _, count in results if count is not None]
+    errors = sum(1 for error, _, _ in results if error)
+    return {
+        "scenario": name,
+        "requests": len(results),
+        "errors": errors,
+        "throughput_rps": round(len(results) / wall, 2),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 3),
+            "p50": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3),
+        },
+        "queries_per_request": (
+            round(statistics.mean(queries), 2) if queries else None
+        ),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not (args.skip_seed or args.force
+            or is_local_database(args.database_url)):
+        sys.exit("Refusing to empty a database on another host for the "
+                 "benchmark; pass --force if that is intended")
+    # Settings read the database URL when first imported
+    os.environ["DATABASE_URL"] = args.database_url
+    from app import app
+    from db import db
+    from models import Project, User
+
+    with app.app_context():
+        if not args.skip_seed:
+            seed_started = time.perf_counter()
+            seed(db, args)
+            print(f"Seeded in {time.perf_counter() - seed_started:.1f}s",
+                  file=sys.stderr)
+        user = User.query.filter_by(username="bench0").one()
+        project_ids = [p.id for p in Project.query.filter_by(
+            user_id=user.id).order_by(Project.id).limit(50)]
+        victims = create_delete_victims(
+            db, user.id, args.requests, args.delete_tasks)
+
+    if args.url:
+        driver = HTTPDriver(args.url)
+    elif args.streams:
+        sys.exit("--streams needs --url")
+    else:
+        with app.app_context():
+            driver = TestClientDriver(app, QueryCounter(db.engine))
+
+    rng = random.Random(args.seed)
+    n = args.requests
+    scenarios = [("dashboard", [("GET", "/dashboard", None)] * n)]
+    for sort_by, sort_order in SORT_MODES:
+        scenarios.append((f"project_details:{sort_by}:{sort_order}", [
+            ("GET", f"/project/{rng.choice(project_ids)}"
+                    f"?sort_by={sort_by}&sort_order={sort_order}", None)
+            for _ in range(n)
+        ]))
+    scenarios.append(("add_task", [
+        ("POST", f"/add_task/{rng.choice(project_ids)}", {
+            "title": f"Benchmark task {i}", "description": "Added",
+            "due_date": "2030-01-01", "status": "To Do",
+            "priority": "High"})
+        for i in range(n)
+    ]))
+    scenarios.append(("delete_project", [
+        ("POST", f"/delete_project/{project_id}", None)
+        for project_id in victims
+    ]))
+
+    stop_streams = threading.Event()
+    for i in range(args.streams):
+        driver.hold_stream(
+            f"/project/{project_ids[i % len(project_ids)]}/events",
+            stop_streams)
+    if args.streams:
+        # Let the streams connect before timing anything
+        time.sleep(1)
+
+    report = {
+        "mode": "http" if args.url else "test_client",
+        "database": args.database_url.split(":", 1)[0],
+        "dataset": {
+            "users": args.users,
+            "projects": args.projects,
+            "tasks": args.tasks,
+            "delete_tasks": args.delete_tasks,
+        },
+        "concurrency": args.concurrency,
+        "streams": args.streams,
+        "scenarios": [
+            run_scenario(driver, name, requests, args.concurrency)
+            for name, requests in scenarios
+        ],
+    }
+    stop_streams.set()
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+# build_assets.py
+"""
+Build fingerprinted static assets for production.
+
+    python build_assets.py           # build assets/dist and its manifest
+    python build_assets.py --vendor  # download the vendored libraries again
+
+Every file under the asset directories below is copied to assets/dist
+with a hash of its contents in the name, so it can be cached forever
+and a changed file always gets a new URL. CSS and JavaScript are
+minified, and text assets get .gz and .br siblings that the static view
+serves to browsers accepting them. The manifest maps each source path
+to its built path, for url_for('static', ...) to rewrite links.
+
+Minifying JavaScript needs the rjsmin package, and Brotli files need
+brotli; without them those steps are skipped.
+"""
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+import shutil
+import urllib.request
+
+logger = logging.getLogger("build_assets")
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+# Directories under assets/ that pages link to. assets/readme only holds
+# the README's screenshots.
+SOURCE_DIRS = ("css", "js", "images", "favicon", "vendor")
+COMPRESSIBLE = (".css", ".js", ".svg", ".ico", ".json", ".txt")
+# Hex digits of the content hash kept in built filenames
+HASH_LENGTH = 12
+
+# Third party files kept in assets/vendor, with the integrity hash the
+# download must match
+VENDORED = {
+    "vendor/bootstrap/css/bootstrap.min.css": (
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/"
+        "bootstrap.min.css",
+        "sha384-QWTKZyjpPEjISv5WaRU9OFeRpok6YctnYmDr5pNlyT2bRjXh0JMhjY6hW+"
+        "ALEwIH",
+    ),
+    "vendor/bootstrap/js/bootstrap.bundle.min.js": (
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/"
+        "bootstrap.bundle.min.js",
+        "sha384-YvpcrYf0tY3lHB60NNkmXc5s9fDVZLESaAA55NDzOxhy9GkcIdslK1eN7N"
+        "6jIeHz",
+    ),
+}
+
+# Strings, comments, punctuation that needs no surrounding whitespace,
+# and other runs of whitespace, in that order of precedence
+CSS_TOKEN = re.compile(
+    r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')'
+    r"|(/\*.*?\*/)"
+    r"|\s*(;)\s*(?=\})"
+    r"|\s*([{};,>])\s*"
+    r"|(\s+)",
+    re.S,
+)
+CSS_URL = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+# Source maps are not shipped, so links to them are dropped
+SOURCE_MAP = re.compile(
+    r"\n?(/\*# sourceMappingURL=[^*]*\*/|//# sourceMappingURL=\S*)\s*$"
+)
+
+
+def minify_css(css):
+    """
+    Drop comments, other than /*! licence banners, and whitespace that
+    does not separate anything. Strings are left exactly as they are.
+    """
+    def replace(match):
+        string, comment, last_semicolon, punctuation, space = match.groups()
+        if string:
+            return string
+        if comment:
+            return comment if comment.startswith("/*!") else ""
+        if last_semicolon:
+            # A block's closing brace ends its last declaration anyway
+            return ""
+        return punctuation or " "
+
+    return CSS_TOKEN.sub(replace, css).strip()
+
+
+def minify_js(js):
+    try:
+        import rjsmin
+    except ImportError:
+        logger.warning("rjsmin is not installed, JavaScript is not minified")
+        return js
+    return rjsmin.jsmin(js, keep_bang_comments=True)
+
+
+def hashed_name(path, content):
+    """
+    Insert a hash of content before the extension: css/site.css becomes
+    css/site.0123456789ab.css.
+    """
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    root, ext = posixpath.splitext(path)
+    return f"{root}.{digest}{ext}"
+
+
+def rewrite_css_urls(css, path, manifest):
+    """
+    Point relative url() references at their built files.
+    """
+    directory = posixpath.dirname(path)
+
+    def replace(match):
+        target = match.group(2)
+        if ":" in target or target.startswith(("/", "#")):
+            return match.group(0)
+        bare = target.split("?")[0].split("#")[0]
+        source = posixpath.normpath(posixpath.join(directory, bare))
+        if source not in manifest:
+            return match.group(0)
+        built = posixpath.relpath(manifest[source], directory)
+        return f'url("{built}{target[len(bare):]}")'
+
+    return CSS_URL.sub(replace, css)
+
+
+def source_files(assets_dir):
+    """
+    Return the paths, relative to assets_dir, of every asset to build.
+    Stylesheets come last, so the files they reference are built first.
+    """
+    paths = []
+    for top in SOURCE_DIRS:
+        for dirpath, _, filenames in os.walk(os.path.join(assets_dir, top)):
+            for filename in filenames:
+                full = os.path.join(dirpath, filename)
+                paths.append(
+                    os.path.relpath(full, assets_dir).replace(os.sep, "/"))
+    return sorted(paths, key=lambda path: (path.endswith(".css"), path))
+
+
+def process(path, content, manifest):
+    """
+    Return the built contents of one asset.
+    """
+    if path.endswith((".css", ".js")):
+        text = SOURCE_MAP.sub("", content.decode("utf-8"))
+        if path.endswith(".css"):
+            text = rewrite_css_urls(text, path, manifest)
+            if not path.endswith(".min.css"):
+                text = minify_css(text)
+        elif not path.endswith(".min.js"):
+            text = minify_js(text)
+        content = text.encode("utf-8")
+    return content
+
+
+def precompress(full_path, content):
+    """
+    Write .gz and, if brotli is installed, .br siblings of a built file,
+    unless they would not be smaller.
+    """
+    compressed = {".gz": gzip.compress(content, 9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        logger.warning("brotli is not installed, skipping %s.br", full_path)
+    else:
+        compressed[".br"] = brotli.compress(content, quality=11)
+    for ext, data in compressed.items():
+        if len(data) < len(content):
+            with open(full_path + ext, "wb") as f:
+                f.write(data)
+
+
+def build(assets_dir=ASSETS_DIR):
+    """
+    Rebuild assets/dist from scratch and return the manifest.
+    """
+    dist = os.path.join(assets_dir, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+    manifest = {}
+    for path in source_files(assets_dir):
+        with open(os.path.join(assets_dir, path), "rb") as f:
+            content = process(path, f.read(), manifest)
+        built = posixpath.join(DIST_DIR, hashed_name(path, content))
+        full_path = os.path.join(assets_dir, built)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as f:
+            f.write(content)
+        if path.endswith(COMPRESSIBLE):
+            precompress(full_path, content)
+        manifest[path] = built
+        logger.info("%s -> %s", path, built)
+
+    with open(os.path.join(dist, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def vendor(assets_dir=ASSETS_DIR):
+    """
+    Download each vendored file, refusing any that does not match its
+    integrity hash.
+    """
+    for path, (url, integrity) in VENDORED.items():
+        with urllib.request.urlopen(url, timeout=30) as response:
+            content = response.read()
+        algorithm, expected = integrity.split("-", 1)
+        actual = base64.b64encode(
+            hashlib.new(algorithm, content).digest()).decode()
+        if actual != expected:
+            raise ValueError(f"Integrity check failed for {url}")
+        full_path = os.path.join(assets_dir, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "wb") as f:
+            f.write(content)
+        logger.info("Vendored %s", url)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--vendor", action="store_true",
+                        help="download the vendored libraries first")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.vendor:
+        vendor()
+    manifest = build()
+    print(f"Built {len(manifest)} assets into assets/{DIST_DIR}.")
+
+
+if __name__ == "__main__":
+    main()
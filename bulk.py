@@ -0,0 +1,142 @@
+# bulk.py
+import csv
+import io
+import json
+from sqlalchemy import insert
+from db import db
+from models import Task
+from queries import bump_project_version
+from validation import DATE_FORMAT, task_fields
+
+# Columns read on import and written on export, in file order
+TASK_COLUMNS = ("title", "description", "status", "priority", "due_date")
+
+# Formats supported for import and export, mapped to their media type
+TASK_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# Stop collecting row errors after this many, one bad file is enough
+MAX_REPORTED_ERRORS = 20
+
+
+class TaskImportError(Exception):
+    """
+    Raised when an uploaded file has invalid rows.
+    Carries a list of messages naming the offending lines.
+    """
+
+    def __init__(self, errors):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+def read_rows(stream, fmt):
+    """
+    Yield (line number, row) pairs from an uploaded binary stream
+    without reading the whole file into memory.
+    NDJSON lines that are not valid JSON are yielded as None.
+    """
+    text_stream = io.TextIOWrapper(stream, encoding="utf-8-sig")
+    if fmt == "csv":
+        reader = csv.DictReader(text_stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(text_stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            # Reported by import_tasks alongside any other bad rows
+            row = None
+        yield line_number, row
+
+
+def import_tasks(project_id, rows, batch_size):
+    """
+    Validate rows and insert them into a project in batches of
+    batch_size, each sent as a single executemany.
+    Nothing is committed if any row is invalid; TaskImportError lists the
+    problems instead. Returns the number of tasks imported.
+    """
+    batch, errors, imported = [], [], 0
+    try:
+        for line_number, row in rows:
+            try:
+                if not isinstance(row, dict):
+                    raise ValueError("Expected a JSON object.")
+                fields = task_fields(row)
+            except ValueError as e:
+                errors.append(f"Line {line_number}: {e}")
+                if len(errors) >= MAX_REPORTED_ERRORS:
+                    break
+                continue
+            if errors:
+                # The import will be rolled back, so only keep checking
+                continue
+            fields["project_id"] = project_id
+            batch.append(fields)
+            if len(batch) >= batch_size:
+                db.session.execute(insert(Task), batch)
+                imported += len(batch)
+                batch = []
+
+        if errors:
+            raise TaskImportError(errors)
+        if batch:
+            db.session.execute(insert(Task), batch)
+            imported += len(batch)
+        bump_project_version(project_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return imported
+
+
+def _row_values(task):
+    due_date = task.due_date.strftime(DATE_FORMAT) if task.due_date else ""
+    return {
+        "title": task.title,
+        "description": task.description or "",
+        "status": task.status,
+        "priority": task.priority,
+        "due_date": due_date,
+    }
+
+
+def export_tasks(project_id, fmt, chunk_size):
+    """
+    Yield a project's tasks as CSV or NDJSON text, a chunk at a time,
+    so memory use stays flat however many tasks are exported.
+    """
+    tasks = (
+        Task.query
+        .filter(Task.project_id == project_id)
+        .order_by(Task.id)
+        .yield_per(chunk_size)
+    )
+
+    buffer = io.StringIO()
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=TASK_COLUMNS)
+        writer.writeheader()
+
+    for count, task in enumerate(tasks, start=1):
+        values = _row_values(task)
+        if writer:
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(values) + "\n")
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
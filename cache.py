@@ -0,0 +1,94 @@
+# cache.py
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    A thread-safe in-process cache holding at most maxsize entries,
+    each expiring ttl seconds after it was set (ttl=None never expires).
+    The least recently used entry is evicted when the cache is full.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    """
+    A cache shared between processes through a Redis-compatible server.
+    Values must be JSON serialisable.
+    """
+
+    def __init__(self, url, prefix, ttl=None):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "The redis package is required for a shared cache URL"
+            ) from e
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + str(key))
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value):
+        self._client.set(
+            self.prefix + str(key), json.dumps(value), ex=self.ttl or None
+        )
+
+    def delete(self, key):
+        self._client.delete(self.prefix + str(key))
+
+    def clear(self):
+        for key in self._client.scan_iter(self.prefix + "*"):
+            self._client.delete(key)
+
+
+def make_cache(url, prefix, maxsize=1024, ttl=None):
+    """
+    Return a RedisCache when a URL is configured,
+    otherwise an in-process LRUCache.
+    """
+    if url:
+        return RedisCache(url, prefix, ttl=ttl)
+    return LRUCache(maxsize=maxsize, ttl=ttl)
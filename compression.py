@@ -0,0 +1,232 @@
+# compression.py
+import zlib
+from werkzeug.http import parse_accept_header, parse_options_header
+
+# Content types worth compressing. Everything else, including images,
+# which are compressed already, and text/event-stream, whose events must
+# reach the browser one at a time, passes through untouched.
+COMPRESSIBLE_TYPES = frozenset({
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+})
+# Responses without a body to compress, or whose byte ranges would no
+# longer line up
+UNCOMPRESSED_STATUSES = frozenset({204, 206, 304})
+
+
+class GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level):
+        # wbits of 16 + 15 writes a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        """
+        Compress data, flushing it so the client can decode everything
+        sent so far.
+        """
+        return (self._compressor.compress(data)
+                + self._compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    name = "br"
+
+    def __init__(self, brotli, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def _load_brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def _header(headers, name):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _without(headers, *names):
+    names = {name.lower() for name in names}
+    return [(key, value) for key, value in headers
+            if key.lower() not in names]
+
+
+def _add_vary(headers):
+    vary = _header(headers, "Vary")
+    if vary is None:
+        return headers + [("Vary", "Accept-Encoding")]
+    fields = {field.strip().lower() for field in vary.split(",")}
+    if "accept-encoding" in fields or "*" in fields:
+        return headers
+    return _without(headers, "Vary") + [
+        ("Vary", f"{vary}, Accept-Encoding")
+    ]
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware compressing responses with Brotli or gzip, whichever
+    the client prefers of those it accepts.
+
+    Only responses of at least min_size bytes with a content type in
+    COMPRESSIBLE_TYPES are compressed, never ones already encoded or
+    marked no-transform. Streamed responses of unknown length are
+    compressed chunk by chunk, flushing each so the stream keeps
+    flowing.
+
+    Compressed bodies of responses with a strong ETag are kept in
+    cache, keyed by the ETag and encoding, since the same ETag promises
+    the same body; a page answered again is then sent without
+    compressing it again. Bodies over max_cached_size are not kept.
+    """
+
+    def __init__(self, app, min_size=1024, gzip_level=6, brotli_quality=4,
+                 cache=None, max_cached_size=1024 * 1024):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = cache
+        self.max_cached_size = max_cached_size
+        self.brotli = _load_brotli()
+
+    def _encoder(self, environ):
+        """
+        Return an encoder for the best encoding the client accepts, or
+        None to leave the response alone.
+        """
+        accepted = parse_accept_header(environ.get("HTTP_ACCEPT_ENCODING"))
+        choices = [("gzip", accepted["gzip"])]
+        if self.brotli is not None:
+            # Brotli wins ties, being smaller at a similar speed
+            choices.insert(0, ("br", accepted["br"]))
+        name, quality = max(choices, key=lambda choice: choice[1])
+        if not quality:
+            return None
+        if name == "br":
+            return BrotliEncoder(self.brotli, self.brotli_quality)
+        return GzipEncoder(self.gzip_level)
+
+    def _compressible(self, status, headers):
+        if int(status.split(" ", 1)[0]) in UNCOMPRESSED_STATUSES:
+            return False
+        if _header(headers, "Content-Encoding"):
+            return False
+        content_type = _header(headers, "Content-Type") or ""
+        if parse_options_header(content_type)[0] not in COMPRESSIBLE_TYPES:
+            return False
+        if "no-transform" in (_header(headers, "Cache-Control") or ""):
+            return False
+        length = _header(headers, "Content-Length")
+        return length is None or int(length) >= self.min_size
+
+    def __call__(self, environ, start_response):
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            return self.app(environ, start_response)
+
+        started = {}
+
+        def capture(status, headers, exc_info=None):
+            if exc_info and started.get("sent"):
+                raise exc_info[1].with_traceback(exc_info[2])
+            started.update(status=status, headers=headers)
+
+            def write(data):
+                # Only for legacy apps writing before returning a body,
+                # which are passed through as they are
+                if not started.get("sent"):
+                    started["sent"] = True
+                    started["write"] = start_response(status, headers)
+                started["write"](data)
+
+            return write
+
+        body = self.app(environ, capture)
+        if started.get("sent"):
+            return body
+
+        status, headers = started["status"], started["headers"]
+        if not self._compressible(status, headers):
+            start_response(status, headers)
+            return body
+
+        headers = _add_vary(headers)
+        encoder = self._encoder(environ)
+        if encoder is None:
+            start_response(status, headers)
+            return body
+
+        etag = _header(headers, "ETag")
+        headers = _without(headers, "Content-Length", "ETag")
+        headers.append(("Content-Encoding", encoder.name))
+        if etag:
+            # The compressed bytes differ, though they mean the same
+            # thing, so only a weak comparison still holds
+            headers.append(
+                ("ETag", etag if etag.startswith("W/") else f"W/{etag}"))
+
+        if _header(started["headers"], "Content-Length") is None:
+            start_response(status, headers)
+            return self._stream(body, encoder)
+
+        key = None
+        if self.cache is not None and etag and not etag.startswith("W/"):
+            key = f"{encoder.name}:{etag}"
+            cached = self.cache.get(key)
+            if cached is not None:
+                _close(body)
+                return self._respond(start_response, status, headers, cached)
+
+        try:
+            data = b"".join(body)
+        finally:
+            _close(body)
+        compressed = encoder.compress(data) + encoder.finish()
+        if key is not None and len(compressed) <= self.max_cached_size:
+            self.cache.set(key, compressed)
+        return self._respond(start_response, status, headers, compressed)
+
+    @staticmethod
+    def _respond(start_response, status, headers, data):
+        start_response(status, headers + [("Content-Length", str(len(data)))])
+        return [data]
+
+    @staticmethod
+    def _stream(body, encoder):
+        try:
+            for chunk in body:
+                if chunk:
+                    yield encoder.compress(chunk)
+            yield encoder.finish()
+        finally:
+            _close(body)
+
+
+def _close(body):
+    close = getattr(body, "close", None)
+    if close is not None:
+        close()
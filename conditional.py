@@ -0,0 +1,69 @@
+# conditional.py
+import glob
+import hashlib
+import os
+from flask import make_response, request, session
+from werkzeug.http import is_resource_modified
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# What pages are rendered from: the code, the templates and the names
+# of the fingerprinted assets they link to
+RELEASE_SOURCES = ("*.py", "templates/*.html", "assets/dist/manifest.json")
+
+
+def release_id(root=ROOT):
+    """
+    Hash the sources pages are rendered from. Every worker and dyno
+    running the same release computes the same one, so a page validated
+    by one can be revalidated by any other, while a deploy that could
+    change pages gives a new one. Heroku's release version, set when
+    dyno metadata is enabled, also covers config changes.
+    """
+    digest = hashlib.sha1(os.getenv("HEROKU_RELEASE_VERSION", "").encode())
+    for pattern in RELEASE_SOURCES:
+        for path in sorted(glob.glob(os.path.join(root, pattern))):
+            digest.update(os.path.relpath(path, root).encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+# So pages rendered by an older release are never answered with a 304
+RELEASE_ID = release_id()
+
+
+def conditional_page(validators, last_modified, render):
+    """
+    Answer a GET with 304 Not Modified when the client's copy is still
+    valid, otherwise call render() and tag the response so the client
+    can revalidate next time.
+    validators is anything whose repr changes when the page would;
+    the user, URL and release are always included.
+    """
+    # Pending flash messages are part of the page but not the validators
+    if session.get("_flashes"):
+        return render()
+
+    etag = hashlib.sha1(
+        repr((RELEASE_ID, session.get("_user_id"), request.full_path,
+              validators)).encode()
+    ).hexdigest()
+    if last_modified is not None:
+        # HTTP dates have whole-second precision
+        last_modified = last_modified.replace(microsecond=0)
+
+    if not is_resource_modified(
+        request.environ, etag=etag, last_modified=last_modified
+    ):
+        response = make_response("", 304)
+    else:
+        response = make_response(render())
+
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Pages are per user, and must be revalidated before every reuse
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add("Cookie")
+    return response
@@ -2,3 +2,19 @@
 from flask_sqlalchemy import SQLAlchemy
 
 db = SQLAlchemy()
+
+
+def make_psycopg_green():
+    """
+    Let psycopg2 hand control to other greenlets while it waits on the
+    database, instead of blocking every request in a gevent worker.
+    Call once per process, before any connection is opened.
+    """
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError as e:
+        raise RuntimeError(
+            "The psycogreen and gevent packages are required for gevent "
+            "workers"
+        ) from e
+    patch_psycopg()
@@ -1,27 +1,81 @@
 # db_init.py
+"""
+Create or upgrade the database schema.
 
+    python db_init.py            # apply pending migrations, safe while live
+    python db_init.py --status   # list migrations and which are applied
+    python db_init.py --reset    # drop everything first (development only)
+
+See migrate.py for how migrations stay safe on a live database.
+"""
+import argparse
+import logging
 from sqlalchemy import text
 from db import db
 from app import app
+from migrate import applied_versions, discover, upgrade
 from dotenv import load_dotenv
 load_dotenv()
 
 
-# Ensure the Flask app context is pushed
-with app.app_context():
-    print("Dropping all tables with CASCADE...")
-
-    # Use raw SQL to drop the entire public schema, which forces
-    # all tables and their dependent objects (like foreign keys) to be dropped.
-    try:
+def reset_schema():
+    """
+    Drop every table, for a clean local database.
+    """
+    if db.engine.dialect.name == "postgresql":
+        # Dropping the whole public schema also removes objects the
+        # models do not know about
         db.session.execute(text('DROP SCHEMA public CASCADE;'))
         db.session.execute(text('CREATE SCHEMA public;'))
         db.session.commit()
-        print("Existing database schema dropped and recreated successfully.")
-    except Exception as e:
-        print(f"Error dropping schema: {e}")
-        db.session.rollback()
-
-    print("Creating new database tables...")
-    db.create_all()
-    print("Database tables created successfully!")
+    else:
+        db.drop_all()
+        db.session.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+        db.session.execute(text("DROP TABLE IF EXISTS task_fts"))
+        db.session.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--status", action="store_true",
+                        help="list migrations without applying them")
+    parser.add_argument("--reset", action="store_true",
+                        help="drop all tables and data first")
+    parser.add_argument("--lock-timeout", default="5s",
+                        help="longest wait for a lock before retrying")
+    parser.add_argument("--retries", type=int, default=10,
+                        help="retries of a statement that timed out")
+    parser.add_argument("--batch-size", type=int, default=5000,
+                        help="rows updated per backfill batch")
+    parser.add_argument("--batch-pause", type=float, default=0.0,
+                        help="seconds to pause between backfill batches")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    # Ensure the Flask app context is pushed
+    with app.app_context():
+        if args.status:
+            with db.engine.connect() as connection:
+                done = applied_versions(connection)
+            for migration in discover():
+                state = "applied" if migration.version in done else "pending"
+                print(f"{migration.version}_{migration.name}: {state}")
+            return
+
+        if args.reset:
+            print("Dropping all tables...")
+            reset_schema()
+
+        applied = upgrade(
+            db.engine,
+            db.metadata,
+            lock_timeout=args.lock_timeout,
+            retries=args.retries,
+            batch_size=args.batch_size,
+            batch_pause=args.batch_pause,
+        )
+        print(f"Database is up to date ({len(applied)} migrations applied).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# db_pool.py
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+
+class PoolMetrics:
+    """
+    Running totals of connection checkouts and how long they waited.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.connects = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+
+# Shared by every pool in the process
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """
+    A QueuePool that records how long each checkout waited
+    for a free connection.
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.record_wait(time.perf_counter() - started)
+
+
+def install_pool_metrics(engine):
+    """
+    Count new physical connections opened by the engine's pool.
+    """
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        pool_metrics.record_connect()
+
+
+def pool_stats(engine):
+    """
+    Return a snapshot of the engine's pool as a dict.
+    """
+    pool = engine.pool
+    stats = {
+        "pool": type(pool).__name__,
+        "checkouts": pool_metrics.checkouts,
+        "connects": pool_metrics.connects,
+        "checkout_wait_seconds_total": round(
+            pool_metrics.wait_seconds_total, 6),
+        "checkout_wait_seconds_max": round(pool_metrics.wait_seconds_max, 6),
+    }
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+        )
+    return stats
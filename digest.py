@@ -0,0 +1,104 @@
+# digest.py
+from datetime import datetime, timedelta
+from sqlalchemy import case, delete, exists, func, insert, literal, select
+from db import db
+from models import DueTask, Project, Task
+
+
+def refresh_due_digest(due_soon_days, now=None):
+    """
+    Bring the due digest up to date: every open task that is overdue or
+    due within due_soon_days, for all users, in one transaction.
+    Only entries that changed are touched, so computed_at, and the
+    dashboard validators built on it, stay put when nothing did.
+    Readers keep seeing the previous digest until it commits.
+    Returns the number of entries removed and written.
+    """
+    now = now or datetime.utcnow()
+    upcoming = [
+        Task.due_date < now + timedelta(days=due_soon_days),
+        Task.status != 'Done',
+    ]
+    # Entries whose task finished, moved or left the window; changed
+    # ones are written again below
+    current = (
+        select(Task.id)
+        .join(Project, Project.id == Task.project_id)
+        .where(
+            Task.id == DueTask.task_id,
+            Project.user_id == DueTask.user_id,
+            Task.due_date == DueTask.due_date,
+            *upcoming,
+        )
+    )
+    removed = db.session.execute(
+        delete(DueTask).where(~exists(current))
+    ).rowcount
+    missing = (
+        select(
+            Project.user_id,
+            Task.id,
+            Task.due_date,
+            literal(now, DueTask.computed_at.type),
+        )
+        .join(Project, Project.id == Task.project_id)
+        .where(
+            *upcoming,
+            ~exists(select(DueTask.task_id).where(DueTask.task_id == Task.id)),
+        )
+    )
+    written = db.session.execute(
+        insert(DueTask).from_select(
+            ['user_id', 'task_id', 'due_date', 'computed_at'], missing
+        )
+    ).rowcount
+    db.session.commit()
+    return removed + written
+
+
+def _digest_query(user_id, *columns):
+    return (
+        db.session.query(*columns)
+        .select_from(DueTask)
+        .join(Task, Task.id == DueTask.task_id)
+        .join(Project, Project.id == Task.project_id)
+        .filter(
+            DueTask.user_id == user_id,
+            # Guards against stale entries for reused task ids
+            Project.user_id == user_id,
+            ~Project.deleting,
+            Task.status != 'Done',
+            Task.due_date.isnot(None),
+        )
+    )
+
+
+def due_digest(user_id, limit, now=None):
+    """
+    Return (overdue, due soon, overdue count, due soon count) for a
+    user, read from the digest. Each list holds up to limit
+    (task, project) pairs, soonest first, so a long overdue list never
+    crowds out the tasks due soon.
+    Tasks finished since the last refresh are left out; other changes
+    show up after the next refresh.
+    """
+    now = now or datetime.utcnow()
+
+    def bounded(condition):
+        # One range read each on ix_due_task_user_due_date
+        return (
+            _digest_query(user_id, Task, Project)
+            .filter(condition)
+            .order_by(DueTask.due_date, Task.id)
+            .limit(limit)
+            .all()
+        )
+
+    overdue = bounded(DueTask.due_date < now)
+    due_soon = bounded(DueTask.due_date >= now)
+    overdue_count, due_soon_count = _digest_query(
+        user_id,
+        func.count(case((DueTask.due_date < now, 1))),
+        func.count(case((DueTask.due_date >= now, 1))),
+    ).one()
+    return overdue, due_soon, overdue_count, due_soon_count
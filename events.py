@@ -0,0 +1,216 @@
+# events.py
+import json
+import logging
+import os
+import queue
+import select
+import threading
+import time
+from flask import current_app, url_for
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL channel carrying every project's board events
+NOTIFY_CHANNEL = "checkmate_board_events"
+# Longest a new subscriber waits for this process to start listening
+LISTEN_WAIT = 5
+
+
+class Subscription:
+    """
+    The events published to one channel since subscribing, buffered
+    up to maxsize. A subscriber that falls further behind is marked
+    as overflowed and should reload instead of applying deltas.
+    """
+
+    def __init__(self, broker, channel, maxsize):
+        self.broker = broker
+        self.channel = channel
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize)
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """
+        Return the next event, or None if none arrives within timeout
+        seconds.
+        """
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LocalBroker:
+    """
+    In-process publish/subscribe. Only subscribers in the same process
+    see an event, which suits a single worker or local development.
+    """
+
+    def __init__(self, maxsize=100):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.maxsize)
+        with self._lock:
+            self._subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.channel]
+
+    def publish(self, channel, event):
+        self.deliver(channel, event)
+
+    def deliver(self, channel, event):
+        # Copy so subscribers can come and go while delivering
+        with self._lock:
+            subscribers = list(self._subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            subscription.put(event)
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Publish/subscribe across processes and dynos through PostgreSQL
+    LISTEN/NOTIFY. Each process keeps one listening connection, opened
+    on first subscribe, and fans notifications out to its subscribers.
+    Payloads must stay under PostgreSQL's 8000 byte limit.
+    """
+
+    def __init__(self, engine, maxsize=100):
+        super().__init__(maxsize)
+        self.engine = engine
+        self._listener_pid = None
+        self._listening = threading.Event()
+
+    def subscribe(self, channel):
+        subscription = super().subscribe(channel)
+        self._ensure_listener()
+        # Events published before LISTEN runs would never arrive
+        if not self._listening.wait(LISTEN_WAIT):
+            logger.warning("Board event listener is not listening yet")
+        return subscription
+
+    def publish(self, channel, event):
+        payload = json.dumps({"channel": channel, "event": event})
+        with self.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "SELECT pg_notify(%(channel)s, %(payload)s)",
+                {"channel": NOTIFY_CHANNEL, "payload": payload},
+            )
+
+    def _ensure_listener(self):
+        # Forked gunicorn workers each start their own listener
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            self._listening = threading.Event()
+        threading.Thread(
+            target=self._listen, name="board-events", daemon=True
+        ).start()
+
+    def _listen(self):
+        while True:
+            try:
+                self._listen_once()
+            except Exception:
+                logger.exception("Board event listener failed, reconnecting")
+                time.sleep(1)
+
+    def _listen_once(self):
+        # A connection of its own, so it never holds a pool slot
+        connection = self.engine.raw_connection()
+        dbapi_connection = connection.driver_connection
+        connection.detach()
+        try:
+            dbapi_connection.autocommit = True
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            self._listening.set()
+            while True:
+                if select.select([dbapi_connection], [], [], 5) == \
+                        ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    notify = dbapi_connection.notifies.pop(0)
+                    message = json.loads(notify.payload)
+                    self.deliver(message["channel"], message["event"])
+        finally:
+            self._listening.clear()
+            connection.close()
+
+
+def make_broker(kind, engine, maxsize=100):
+    """
+    Return a PostgresBroker when kind is 'postgres',
+    otherwise an in-process LocalBroker.
+    """
+    if kind == "postgres":
+        return PostgresBroker(engine, maxsize=maxsize)
+    if kind not in ("", "local"):
+        raise ValueError(f"Unknown EVENTS_BROKER: {kind!r}")
+    return LocalBroker(maxsize=maxsize)
+
+
+def project_channel(project_id):
+    return f"project:{project_id}"
+
+
+def publish(project_id, event_type, **data):
+    """
+    Tell everyone watching a project's board that it changed.
+    Call after the change is committed. Does nothing unless
+    LIVE_UPDATES is enabled.
+    """
+    broker = current_app.extensions.get("events")
+    if broker is None:
+        return
+    event = dict(data, type=event_type)
+    try:
+        broker.publish(project_channel(project_id), event)
+    except Exception:
+        # Watchers miss a live update, but the change itself is saved
+        logger.exception("Could not publish %s event", event_type)
+
+
+def publish_task(event_type, task):
+    """
+    Publish a task_created, task_updated or task_moved event with what
+    a board needs to fetch and place the task's card.
+    """
+    publish(
+        task.project_id,
+        event_type,
+        task_id=task.id,
+        status=task.status,
+        position=task.position,
+        card_url=url_for("task_card", task_id=task.id),
+    )
+
+
+def publish_task_deleted(project_id, task_id):
+    publish(project_id, "task_deleted", task_id=task_id)
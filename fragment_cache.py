@@ -0,0 +1,37 @@
+# fragment_cache.py
+from markupsafe import Markup
+
+
+class FragmentCache:
+    """
+    Caches the rendered HTML of a template for individual model objects,
+    keyed by the object's id and checked against its version.
+    A changed version re-renders the fragment and replaces the stale copy.
+    """
+
+    def __init__(self, backend, template_name, context_name):
+        self.backend = backend
+        self.template_name = template_name
+        # Name the object is given inside the template
+        self.context_name = context_name
+
+    def render(self, jinja_env, obj, version):
+        key = str(obj.id)
+        entry = self.backend.get(key)
+        if entry is not None and entry[0] == version:
+            return Markup(entry[1])
+
+        template = jinja_env.get_template(self.template_name)
+        html = template.render({self.context_name: obj})
+        self.backend.set(key, [version, html])
+        return Markup(html)
+
+    def invalidate(self, obj_id):
+        self.backend.delete(str(obj_id))
+
+
+def task_version(task):
+    """
+    The version of a task used to check its cached card.
+    """
+    return task.updated_at.isoformat() if task.updated_at else None
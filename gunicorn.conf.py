@@ -0,0 +1,108 @@
+# gunicorn.conf.py
+"""
+Gunicorn settings, read automatically when gunicorn starts in this
+directory (see the Procfile).
+
+The app is imported once in the master and forked into each worker, so
+workers start with modules imported and templates compiled, then open
+their database connections before taking traffic. Boot timings are
+logged and reported at /health.
+
+GUNICORN_WORKER_CLASS=gevent switches to the high concurrency profile:
+each worker serves up to GUNICORN_WORKER_CONNECTIONS requests at once
+on greenlets, switching between them while they wait on the database
+or hold open live update streams. Requires the gevent and psycogreen
+packages.
+
+Password hashing slots are made in the master and shared by every
+worker. With sync workers, which serve one request at a time, at most
+half the workers may be hashing at once, so a login burst leaves the
+rest serving pages.
+"""
+import os
+import time
+
+
+def _env_flag(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "sync")
+gevent_workers = worker_class == "gevent"
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "100"))
+
+# Import the app before forking, so workers share the work. Set
+# GUNICORN_PRELOAD=false to import it in each worker instead. Off by
+# default for gevent, which must patch the standard library before the
+# app's modules create their locks.
+preload_app = _env_flag("GUNICORN_PRELOAD", not gevent_workers)
+
+_master_started = time.perf_counter()
+_worker_forked = {}
+
+
+def _dispose_inherited_connections():
+    from app import app
+    from db import db
+    # Connections must never be shared across a fork
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def _hashing_slots(server):
+    from settings import Config
+    slots = Config.PASSWORD_HASH_MAX_PENDING
+    if not gevent_workers:
+        slots = min(slots, max(1, server.cfg.workers // 2))
+    return slots
+
+
+def when_ready(server):
+    import hashing
+    import warmup
+    # Before any worker is forked, so they all share one set
+    hashing.share_slots(_hashing_slots(server))
+    if preload_app:
+        from app import app
+        warmup.boot_times["import"] = round(
+            time.perf_counter() - _master_started, 4)
+        # Compiled once here, inherited by every worker
+        warmup.timed("templates", warmup.compile_templates, app)
+    server.log.info("Master ready in %.2fs (%s workers)",
+                    time.perf_counter() - _master_started, worker_class)
+
+
+def child_exit(server, worker):
+    import hashing
+    # A worker killed mid-hash never gives its slots back itself
+    hashing.release_slots(worker.pid)
+
+
+def post_fork(server, worker):
+    _worker_forked[os.getpid()] = time.perf_counter()
+    if gevent_workers:
+        from db import make_psycopg_green
+        make_psycopg_green()
+    elif preload_app:
+        _dispose_inherited_connections()
+
+
+def post_worker_init(worker):
+    import warmup
+    from app import app
+    from db import db
+    forked = _worker_forked.pop(os.getpid(), time.perf_counter())
+    if not preload_app:
+        warmup.boot_times["import"] = round(time.perf_counter() - forked, 4)
+    elif gevent_workers:
+        # Now gevent has patched threading, so the new pool's locks let
+        # other greenlets run while one waits for a connection
+        _dispose_inherited_connections()
+    with app.app_context():
+        engine = db.engine
+    warmup.warmup(app, engine, app.config["WARMUP_DB_CONNECTIONS"])
+    warmup.boot_times["worker"] = round(time.perf_counter() - forked, 4)
+    worker.log.info("Worker %s booted: %s", os.getpid(), warmup.boot_times)
@@ -0,0 +1,164 @@
+# hashing.py
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from functools import lru_cache
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """
+    Raised when too many password hashes are already running, or one
+    takes too long, so the request is turned away instead of tying up
+    the worker.
+    """
+
+
+class HashingSlots:
+    """
+    A fixed number of job slots, each recording the pid holding it.
+    Made before gunicorn forks, one set is shared by every worker, so
+    the limit holds across the whole server; the master frees a dead
+    worker's slots when it exits.
+    """
+
+    def __init__(self, size):
+        self._holders = multiprocessing.Array("i", size)
+
+    def acquire(self):
+        """
+        Take a free slot without waiting; return its index, or None
+        when all are taken.
+        """
+        with self._holders.get_lock():
+            for index, pid in enumerate(self._holders):
+                if not pid:
+                    self._holders[index] = os.getpid()
+                    return index
+        return None
+
+    def release(self, index):
+        with self._holders.get_lock():
+            self._holders[index] = 0
+
+    def release_process(self, pid):
+        with self._holders.get_lock():
+            for index, holder in enumerate(self._holders):
+                if holder == pid:
+                    self._holders[index] = 0
+
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_slots = None
+_shared_slots = None
+
+
+def share_slots(size):
+    """
+    Create the job slots shared by every process forked afterwards.
+    Called from the gunicorn master; without it each process makes its
+    own.
+    """
+    global _shared_slots
+    _shared_slots = HashingSlots(size)
+
+
+def release_slots(pid):
+    """
+    Free the shared slots held by a process that has exited.
+    """
+    if _shared_slots is not None:
+        _shared_slots.release_process(pid)
+
+
+def _config():
+    config = current_app.config
+    return (
+        config["PASSWORD_HASH_METHOD"],
+        config["PASSWORD_SALT_LENGTH"],
+        config["PASSWORD_HASH_WORKERS"],
+        config["PASSWORD_HASH_MAX_PENDING"],
+        config["PASSWORD_HASH_TIMEOUT"],
+    )
+
+
+def _pool(workers, max_pending):
+    """
+    Return this process's executor and the job slots, creating them on
+    first use. Forked gunicorn workers each get their own executor.
+    """
+    global _executor, _executor_pid, _slots
+    with _lock:
+        if _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(workers) if workers else None
+            _slots = _shared_slots or HashingSlots(max_pending)
+            _executor_pid = os.getpid()
+        return _executor, _slots
+
+
+def _run(func, *args):
+    """
+    Run a CPU-bound hashing function on the process pool, or inline
+    when no pool is configured. Turned away at once when every job
+    slot is taken, and after PASSWORD_HASH_TIMEOUT seconds when the
+    hash has not finished.
+    """
+    _, _, workers, max_pending, timeout = _config()
+    executor, slots = _pool(workers, max_pending)
+    slot = slots.acquire()
+    if slot is None:
+        raise HashingBusy()
+    if executor is None:
+        try:
+            return func(*args)
+        finally:
+            slots.release(slot)
+    future = executor.submit(func, *args)
+    # The slot stays taken until the hash really finishes
+    future.add_done_callback(lambda _: slots.release(slot))
+    try:
+        return future.result(timeout)
+    except FutureTimeout:
+        raise HashingBusy()
+
+
+def hash_password(password):
+    """
+    Hash a password with the configured method and salt length.
+    """
+    method, salt_length, *_ = _config()
+    return _run(generate_password_hash, password, method, salt_length)
+
+
+def verify_password(password_hash, password):
+    """
+    Check a password against a stored hash.
+    """
+    if not password_hash:
+        return False
+    return _run(check_password_hash, password_hash, password)
+
+
+@lru_cache(maxsize=None)
+def _method_prefix(method):
+    # The method as Werkzeug writes it into hashes, defaults filled in
+    return generate_password_hash("", method).split("$", 1)[0]
+
+
+def needs_rehash(password_hash):
+    """
+    Whether a stored hash was made with a different method, cost or
+    salt length from the ones now configured.
+    """
+    method, salt_length, *_ = _config()
+    # Werkzeug hashes are method$salt$hash
+    parts = password_hash.split("$") if password_hash else []
+    if len(parts) != 3:
+        return True
+    prefix, salt, _ = parts
+    return prefix != _method_prefix(method) or len(salt) != salt_length
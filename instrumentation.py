@@ -0,0 +1,226 @@
+# instrumentation.py
+import threading
+import time
+from flask import (
+    Response,
+    abort,
+    before_render_template,
+    g,
+    has_request_context,
+    request,
+    template_rendered,
+)
+from sqlalchemy import event
+from db_pool import pool_stats
+
+# Upper bounds, in seconds, of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+
+class Histogram:
+    """
+    A cumulative histogram in the Prometheus style.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class Metrics:
+    """
+    Per-process request, query and template timings.
+    Each gunicorn worker keeps its own totals, so scrape every worker
+    or sum across them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.requests = {}
+        self.db_queries = {}
+        self.db_seconds = {}
+        self.template_seconds = {}
+
+    def record(self, endpoint, method, status, seconds, queries,
+               db_seconds, template_seconds):
+        key = (endpoint, method)
+        with self._lock:
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.db_queries[key] = 0
+                self.db_seconds[key] = 0.0
+                self.template_seconds[key] = 0.0
+            self.latency[key].observe(seconds)
+            self.db_queries[key] += queries
+            self.db_seconds[key] += db_seconds
+            self.template_seconds[key] += template_seconds
+            status_key = (endpoint, method, str(status))
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+
+    def render(self, engine):
+        """
+        Return all metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            lines += [
+                "# HELP checkmate_requests_total Requests handled.",
+                "# TYPE checkmate_requests_total counter",
+            ]
+            for (endpoint, method, status), value in self.requests.items():
+                labels = _labels(endpoint=endpoint, method=method,
+                                 status=status)
+                lines.append(f"checkmate_requests_total{labels} {value}")
+
+            lines += [
+                "# HELP checkmate_request_duration_seconds Request latency.",
+                "# TYPE checkmate_request_duration_seconds histogram",
+            ]
+            for (endpoint, method), histogram in self.latency.items():
+                name = "checkmate_request_duration_seconds"
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    labels = _labels(endpoint=endpoint, method=method,
+                                     le=str(bound))
+                    lines.append(f"{name}_bucket{labels} {count}")
+                labels = _labels(endpoint=endpoint, method=method, le="+Inf")
+                lines.append(f"{name}_bucket{labels} {histogram.count}")
+                labels = _labels(endpoint=endpoint, method=method)
+                lines.append(f"{name}_sum{labels} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{labels} {histogram.count}")
+
+            for name, help_text, values in (
+                ("checkmate_db_queries_total",
+                 "SQL statements executed.", self.db_queries),
+                ("checkmate_db_seconds_total",
+                 "Time spent executing SQL.", self.db_seconds),
+                ("checkmate_template_seconds_total",
+                 "Time spent rendering templates.", self.template_seconds),
+            ):
+                lines += [f"# HELP {name} {help_text}",
+                          f"# TYPE {name} counter"]
+                for (endpoint, method), value in values.items():
+                    labels = _labels(endpoint=endpoint, method=method)
+                    lines.append(f"{name}{labels} {value}")
+
+        for key, value in pool_stats(engine).items():
+            if isinstance(value, (int, float)):
+                lines += [f"# TYPE checkmate_db_pool_{key} gauge",
+                          f"checkmate_db_pool_{key} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def _labels(**labels):
+    body = ",".join(
+        '{}="{}"'.format(key, value.replace("\\", "\\\\").replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+    return "{" + body + "}"
+
+
+def _request_timings():
+    # Timings for the current request, or None outside of one
+    if not has_request_context():
+        return None
+    return g.get("_timings")
+
+
+def init_instrumentation(app, engine):
+    """
+    Record query counts, database time, template time and latency for
+    every request, add a Server-Timing header to each response, and
+    serve the totals at /metrics.
+    Set METRICS_TOKEN to require 'Authorization: Bearer <token>'.
+    """
+    metrics = Metrics()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context,
+                             executemany):
+        started = conn.info["query_started"].pop()
+        timings = _request_timings()
+        if timings is not None:
+            timings["queries"] += 1
+            timings["db"] += time.perf_counter() - started
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        # A failed statement never reaches after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+    def before_render(sender, template, context, **extra):
+        timings = _request_timings()
+        if timings is not None:
+            timings["template_started"].append(time.perf_counter())
+
+    def after_render(sender, template, context, **extra):
+        timings = _request_timings()
+        if timings is not None and timings["template_started"]:
+            started = timings["template_started"].pop()
+            # Only count the outermost render so nesting is not doubled
+            if not timings["template_started"]:
+                timings["template"] += time.perf_counter() - started
+
+    # Signals hold weak references, and these handlers are local
+    before_render_template.connect(before_render, app, weak=False)
+    template_rendered.connect(after_render, app, weak=False)
+
+    @app.before_request
+    def start_timer():
+        g._timings = {
+            "started": time.perf_counter(),
+            "queries": 0,
+            "db": 0.0,
+            "template": 0.0,
+            "template_started": [],
+        }
+
+    @app.after_request
+    def record_request(response):
+        timings = g.pop("_timings", None)
+        if timings is None:
+            return response
+        total = time.perf_counter() - timings["started"]
+        endpoint = request.endpoint or "unmatched"
+        metrics.record(endpoint, request.method, response.status_code, total,
+                       timings["queries"], timings["db"],
+                       timings["template"])
+        response.headers.add(
+            "Server-Timing",
+            f'db;dur={timings["db"] * 1000:.2f};'
+            f'desc="{timings["queries"]} queries", '
+            f'tpl;dur={timings["template"] * 1000:.2f}, '
+            f"total;dur={total * 1000:.2f}",
+        )
+        return response
+
+    @app.route("/metrics")
+    def metrics_endpoint():
+        """
+        Serves request, query and pool metrics for Prometheus.
+        """
+        token = app.config.get("METRICS_TOKEN")
+        if token and request.headers.get("Authorization") != \
+                f"Bearer {token}":
+            abort(401)
+        return Response(metrics.render(engine),
+                        mimetype="text/plain; version=0.0.4")
+
+    return metrics
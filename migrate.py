@@ -0,0 +1,313 @@
+# migrate.py
+"""
+Versioned schema migrations that are safe to run against a live
+database.
+
+Each file in migrations/ is named NNNN_description.py and defines
+upgrade(op), where op is an Operations object. Applied versions are
+recorded in the schema_migrations table. Migrations must be idempotent,
+since one interrupted part way through is simply run again; the
+helpers on Operations all are.
+
+Statements run in autocommit mode rather than in one transaction, so
+that indexes can be built CONCURRENTLY and backfills commit batch by
+batch. Every statement runs under a short lock_timeout and is retried
+when it times out, so a migration waits behind long transactions
+instead of queueing every other query behind itself.
+"""
+import importlib.util
+import logging
+import os
+import re
+import time
+from datetime import datetime
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "migrations")
+# Held while migrating, so two deploys never migrate at once
+ADVISORY_LOCK_ID = 7460125
+
+
+class Operations:
+    """
+    Online-safe schema operations for migrations, on one autocommit
+    connection.
+    """
+
+    def __init__(self, connection, lock_timeout="5s", retries=10,
+                 batch_size=5000, batch_pause=0.0):
+        self.connection = connection
+        self.dialect = connection.dialect.name
+        self.lock_timeout = lock_timeout
+        self.retries = retries
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        if self.is_postgres:
+            # Index builds and backfills may take longer than any web
+            # request is allowed to
+            self.connection.exec_driver_sql("SET statement_timeout = 0")
+            self.connection.exec_driver_sql(
+                f"SET lock_timeout = '{lock_timeout}'")
+
+    @property
+    def is_postgres(self):
+        return self.dialect == "postgresql"
+
+    @property
+    def is_sqlite(self):
+        return self.dialect == "sqlite"
+
+    def execute(self, sql, **params):
+        """
+        Run one statement, retrying with backoff while it cannot get
+        its locks within lock_timeout.
+        """
+        return self._retry(
+            lambda: self.connection.execute(text(sql), params), sql)
+
+    def _retry(self, step, description):
+        for attempt in range(self.retries + 1):
+            try:
+                return step()
+            except OperationalError as e:
+                if not _is_lock_timeout(e) or attempt == self.retries:
+                    raise
+                wait = min(2 ** attempt, 30)
+                logger.warning("Lock timeout, retrying in %ss: %s",
+                               wait, description)
+                time.sleep(wait)
+
+    def has_table(self, table):
+        return inspect(self.connection).has_table(table)
+
+    def has_column(self, table, column):
+        return any(
+            c["name"] == column
+            for c in inspect(self.connection).get_columns(table)
+        )
+
+    def add_column(self, table, column, definition):
+        """
+        Add a column unless it exists. On PostgreSQL 11+ a constant
+        DEFAULT is stored as metadata, so even NOT NULL DEFAULT columns
+        are added without rewriting the table.
+        """
+        if not self.has_column(table, column):
+            self.execute(
+                f'ALTER TABLE "{table}" ADD COLUMN {column} {definition}')
+
+    def backfill(self, table, assignments, where):
+        """
+        Run UPDATE table SET assignments WHERE where over consecutive
+        ranges of batch_size ids, each committed on its own, so every
+        batch is a primary key range scan holding row locks briefly.
+        Rows inserted meanwhile are picked up before returning.
+        Returns the number of rows updated.
+        """
+        total = 0
+        done_up_to = self.execute(
+            f'SELECT COALESCE(MIN(id), 1) - 1 FROM "{table}"').scalar()
+        while True:
+            last_id = self.execute(f'SELECT MAX(id) FROM "{table}"').scalar()
+            if last_id is None or done_up_to >= last_id:
+                return total
+            while done_up_to < last_id:
+                result = self.execute(
+                    f'UPDATE "{table}" SET {assignments} '
+                    f'WHERE id > :low AND id <= :high AND ({where})',
+                    low=done_up_to, high=done_up_to + self.batch_size,
+                )
+                done_up_to += self.batch_size
+                total += result.rowcount
+                if result.rowcount:
+                    logger.info("Backfilled %s rows of %s", total, table)
+                if self.batch_pause:
+                    time.sleep(self.batch_pause)
+
+    def set_not_null(self, table, column):
+        """
+        Make a column NOT NULL without holding an exclusive lock while
+        the table is scanned: a NOT VALID check constraint is validated
+        under a weaker lock first, which PostgreSQL 12+ then trusts.
+        SQLite cannot alter columns, so there it is left to the model.
+        """
+        if not self.is_postgres:
+            return
+        check = f"{table}_{column}_not_null"
+        self.execute(
+            f'ALTER TABLE "{table}" DROP CONSTRAINT IF EXISTS {check}')
+        self.execute(
+            f'ALTER TABLE "{table}" ADD CONSTRAINT {check} '
+            f'CHECK ({column} IS NOT NULL) NOT VALID')
+        self.execute(f'ALTER TABLE "{table}" VALIDATE CONSTRAINT {check}')
+        self.execute(
+            f'ALTER TABLE "{table}" ALTER COLUMN {column} SET NOT NULL')
+        self.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT {check}')
+
+    def create_index(self, name, table, columns, using=None):
+        """
+        Build an index unless it exists, CONCURRENTLY on PostgreSQL so
+        writes to the table carry on. `columns` is the SQL between the
+        parentheses. An invalid index left by an interrupted build is
+        dropped and built again.
+        """
+        using_sql = f" USING {using}" if using else ""
+        if not self.is_postgres:
+            self.execute(
+                f'CREATE INDEX IF NOT EXISTS {name} '
+                f'ON "{table}"{using_sql} ({columns})')
+            return
+
+        def build():
+            # A timed out attempt leaves an invalid index, so each
+            # retry starts by clearing it away
+            invalid = self.connection.execute(text(
+                "SELECT 1 FROM pg_index JOIN pg_class "
+                "ON pg_class.oid = pg_index.indexrelid "
+                "WHERE pg_class.relname = :name "
+                "AND NOT pg_index.indisvalid"), {"name": name}).first()
+            if invalid:
+                self.connection.exec_driver_sql(
+                    f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            self.connection.exec_driver_sql(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+                f'ON "{table}"{using_sql} ({columns})')
+
+        self._retry(build, f"CREATE INDEX {name}")
+
+    def drop_index(self, name):
+        """
+        Drop an index if it exists, CONCURRENTLY on PostgreSQL so
+        writes to its table carry on.
+        """
+        concurrently = " CONCURRENTLY" if self.is_postgres else ""
+        self.execute(f"DROP INDEX{concurrently} IF EXISTS {name}")
+
+    def replace_foreign_key(self, table, old_name, new_name, definition):
+        """
+        Swap a foreign key for a new definition without a long exclusive
+        lock: the new constraint is added NOT VALID, validated, and only
+        then is the old one dropped. SQLite cannot alter constraints,
+        so there it is left to the model.
+        """
+        if not self.is_postgres:
+            return
+        exists = self.execute(
+            "SELECT convalidated FROM pg_constraint WHERE conname = :name",
+            name=new_name,
+        ).first()
+        if exists is None:
+            self.execute(
+                f'ALTER TABLE "{table}" ADD CONSTRAINT {new_name} '
+                f'{definition} NOT VALID')
+        self.execute(f'ALTER TABLE "{table}" VALIDATE CONSTRAINT {new_name}')
+        self.execute(
+            f'ALTER TABLE "{table}" DROP CONSTRAINT IF EXISTS {old_name}')
+
+
+def _is_lock_timeout(error):
+    # 55P03 is PostgreSQL's lock_not_available; SQLite reports a lock
+    code = getattr(error.orig, "pgcode", None)
+    return code == "55P03" or "database is locked" in str(error.orig)
+
+
+class Migration:
+    def __init__(self, path):
+        filename = os.path.basename(path)
+        match = re.match(r"(\d+)_(\w+)\.py$", filename)
+        if not match:
+            raise ValueError(f"Badly named migration: {filename}")
+        self.version, self.name = match.groups()
+        self.path = path
+
+    def upgrade(self, op):
+        spec = importlib.util.spec_from_file_location(
+            f"migrations.m{self.version}", self.path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.upgrade(op)
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """
+    Return every migration in the directory, oldest first.
+    """
+    return sorted(
+        (
+            Migration(os.path.join(directory, filename))
+            for filename in os.listdir(directory)
+            if filename.endswith(".py") and filename[0].isdigit()
+        ),
+        key=lambda migration: migration.version,
+    )
+
+
+def _ensure_version_table(connection):
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version VARCHAR(32) PRIMARY KEY, "
+        "name VARCHAR(128) NOT NULL, "
+        "applied_at TIMESTAMP NOT NULL)"
+    ))
+
+
+def applied_versions(connection):
+    if not inspect(connection).has_table("schema_migrations"):
+        return set()
+    return set(connection.execute(
+        text("SELECT version FROM schema_migrations")).scalars())
+
+
+def _record(connection, migration):
+    connection.execute(
+        text("INSERT INTO schema_migrations (version, name, applied_at) "
+             "VALUES (:version, :name, :applied_at)"),
+        {"version": migration.version, "name": migration.name,
+         "applied_at": datetime.utcnow()},
+    )
+
+
+def upgrade(engine, metadata, **options):
+    """
+    Bring the database up to date. An empty database gets the current
+    schema from the models directly, with every migration recorded as
+    applied; otherwise pending migrations run in order.
+    Options are passed on to Operations.
+    Returns the migrations applied.
+    """
+    migrations = discover()
+    with engine.connect() as connection:
+        connection = connection.execution_options(
+            isolation_level="AUTOCOMMIT")
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_lock(:id)"),
+                               {"id": ADVISORY_LOCK_ID})
+        try:
+            if not inspect(connection).has_table("task"):
+                logger.info("Empty database, creating the current schema")
+                metadata.create_all(connection)
+                _ensure_version_table(connection)
+                for migration in migrations:
+                    _record(connection, migration)
+                return []
+
+            _ensure_version_table(connection)
+            done = applied_versions(connection)
+            pending = [m for m in migrations if m.version not in done]
+            op = Operations(connection, **options)
+            for migration in pending:
+                logger.info("Applying %s_%s", migration.version,
+                            migration.name)
+                started = time.perf_counter()
+                migration.upgrade(op)
+                _record(connection, migration)
+                logger.info("Applied %s_%s in %.1fs", migration.version,
+                            migration.name, time.perf_counter() - started)
+            return pending
+        finally:
+            if connection.dialect.name == "postgresql":
+                connection.execute(text("SELECT pg_advisory_unlock(:id)"),
+                                   {"id": ADVISORY_LOCK_ID})
@@ -0,0 +1,10 @@
+# 0001_baseline.py
+"""
+The user, project and task tables as db_init.py created them before
+migrations existed. Nothing to do: databases from that time already
+have them, and empty databases get the current schema directly.
+"""
+
+
+def upgrade(op):
+    pass
@@ -0,0 +1,15 @@
+# 0002_project_versions.py
+"""
+Project.updated_at and Project.version, which validate cached
+dashboard and project pages.
+"""
+
+
+def upgrade(op):
+    timestamp = "TIMESTAMP" if op.is_postgres else "DATETIME"
+    op.add_column("project", "updated_at", timestamp)
+    op.backfill(
+        "project", "updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)",
+        "updated_at IS NULL",
+    )
+    op.add_column("project", "version", "INTEGER NOT NULL DEFAULT 1")
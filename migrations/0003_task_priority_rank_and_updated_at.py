@@ -0,0 +1,25 @@
+# 0003_task_priority_rank_and_updated_at.py
+"""
+Task.priority_rank, so priority can be sorted and indexed in SQL, and
+Task.updated_at, which versions cached task cards.
+"""
+
+RANK = (
+    "CASE priority WHEN 'High' THEN 1 WHEN 'Medium' THEN 2 "
+    "WHEN 'Low' THEN 3 ELSE 99 END"
+)
+
+
+def upgrade(op):
+    # Every existing row starts at the Medium rank without a rewrite,
+    # then the others are corrected in batches. Tasks the previous
+    # release writes meanwhile are corrected by 0010's trigger.
+    op.add_column("task", "priority_rank", "INTEGER NOT NULL DEFAULT 2")
+    op.backfill("task", f"priority_rank = {RANK}", f"priority_rank <> {RANK}")
+
+    timestamp = "TIMESTAMP" if op.is_postgres else "DATETIME"
+    op.add_column("task", "updated_at", timestamp)
+    op.backfill(
+        "task", "updated_at = COALESCE(created_at, CURRENT_TIMESTAMP)",
+        "updated_at IS NULL",
+    )
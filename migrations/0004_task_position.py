@@ -0,0 +1,17 @@
+# 0004_task_position.py
+"""
+Task.position, the manual order of a kanban column. Existing tasks are
+placed in creation order by id, ahead of any task created from now on.
+"""
+
+
+def upgrade(op):
+    if op.is_postgres:
+        op.add_column("task", "position", "DOUBLE PRECISION")
+        # Tasks added by the previous release while this runs
+        op.execute("ALTER TABLE task ALTER COLUMN position "
+                   "SET DEFAULT EXTRACT(EPOCH FROM now())")
+    else:
+        op.add_column("task", "position", "REAL")
+    op.backfill("task", "position = id", "position IS NULL")
+    op.set_not_null("task", "position")
@@ -0,0 +1,13 @@
+# 0005_task_project_cascade.py
+"""
+Let the database delete a project's tasks along with it.
+"""
+
+
+def upgrade(op):
+    op.replace_foreign_key(
+        "task",
+        "task_project_id_fkey",
+        "task_project_id_cascade_fkey",
+        "FOREIGN KEY (project_id) REFERENCES project (id) ON DELETE CASCADE",
+    )
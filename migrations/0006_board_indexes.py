@@ -0,0 +1,18 @@
+# 0006_board_indexes.py
+"""
+Indexes behind the dashboard, the kanban columns in every sort order
+and the due digest refresh.
+"""
+
+
+def upgrade(op):
+    op.create_index("ix_project_user_id", "project", "user_id")
+    op.create_index("ix_task_project_status_created_at", "task",
+                    "project_id, status, created_at")
+    op.create_index("ix_task_project_status_due_date", "task",
+                    "project_id, status, due_date")
+    op.create_index("ix_task_project_status_priority_rank", "task",
+                    "project_id, status, priority_rank")
+    op.create_index("ix_task_project_status_position", "task",
+                    "project_id, status, position")
+    op.create_index("ix_task_due_date", "task", "due_date")
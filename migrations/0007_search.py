@@ -0,0 +1,25 @@
+# 0007_search.py
+"""
+Full text search: GIN indexes on PostgreSQL, or the FTS5 table and its
+triggers on SQLite, filled from the existing tasks.
+"""
+from search import SQLITE_FTS_DDL
+
+
+def upgrade(op):
+    if op.is_postgres:
+        op.create_index(
+            "ix_task_search", "task",
+            "to_tsvector('english'::regconfig, "
+            "coalesce(title, '') || ' ' || coalesce(description, ''))",
+            using="gin",
+        )
+        op.create_index(
+            "ix_project_search", "project",
+            "to_tsvector('english'::regconfig, name)",
+            using="gin",
+        )
+    elif op.is_sqlite:
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+        op.execute("INSERT INTO task_fts (task_fts) VALUES ('rebuild')")
@@ -0,0 +1,18 @@
+# 0008_due_task.py
+"""
+The due_task table holding the overdue and due soon digest.
+"""
+
+
+def upgrade(op):
+    timestamp = "TIMESTAMP" if op.is_postgres else "DATETIME"
+    op.execute(
+        "CREATE TABLE IF NOT EXISTS due_task ("
+        "task_id INTEGER NOT NULL PRIMARY KEY "
+        "REFERENCES task (id) ON DELETE CASCADE, "
+        'user_id INTEGER NOT NULL REFERENCES "user" (id) ON DELETE CASCADE, '
+        f"due_date {timestamp} NOT NULL, "
+        f"computed_at {timestamp} NOT NULL)"
+    )
+    op.create_index("ix_due_task_user_due_date", "due_task",
+                    "user_id, due_date")
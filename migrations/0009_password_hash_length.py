@@ -0,0 +1,12 @@
+# 0009_password_hash_length.py
+"""
+Room for longer password hashes, such as scrypt's 162 characters.
+"""
+
+
+def upgrade(op):
+    # Widening a VARCHAR only changes the catalog on PostgreSQL, so the
+    # table is not rewritten. SQLite does not enforce lengths.
+    if op.is_postgres:
+        op.execute(
+            'ALTER TABLE "user" ALTER COLUMN password_hash TYPE VARCHAR(256)')
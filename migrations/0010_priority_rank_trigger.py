@@ -0,0 +1,17 @@
+# 0010_priority_rank_trigger.py
+"""
+Keep Task.priority_rank in step with priority on PostgreSQL whoever
+writes the task. 0003 backfilled the ranks once, but the release still
+serving while it ran kept inserting tasks at the Medium rank, and
+changing priorities without touching it.
+"""
+from models import PRIORITY_RANK_TRIGGER_DDL, priority_rank_sql
+
+
+def upgrade(op):
+    if op.is_postgres:
+        for statement in PRIORITY_RANK_TRIGGER_DDL:
+            op.execute(statement)
+    # With the trigger in place, correct whatever was written before it
+    rank = priority_rank_sql("priority")
+    op.backfill("task", f"priority_rank = {rank}", f"priority_rank <> {rank}")
@@ -0,0 +1,17 @@
+# 0011_board_index_ids.py
+"""
+End the kanban column indexes with the task id that breaks sort ties,
+so every page, and the seek to a cursor, is a plain range scan even
+where many tasks share a sort value. The new indexes are built before
+the old ones go.
+"""
+
+SORT_KEYS = ("created_at", "due_date", "priority_rank", "position")
+
+
+def upgrade(op):
+    for key in SORT_KEYS:
+        op.create_index(f"ix_task_project_status_{key}_id", "task",
+                        f"project_id, status, {key}, id")
+    for key in SORT_KEYS:
+        op.drop_index(f"ix_task_project_status_{key}")
@@ -0,0 +1,8 @@
+# 0012_project_deleting.py
+"""
+Project.deleting, marking large projects the worker is deleting.
+"""
+
+
+def upgrade(op):
+    op.add_column("project", "deleting", "BOOLEAN NOT NULL DEFAULT FALSE")
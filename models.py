@@ -1,8 +1,38 @@
 # models.py
 from db import db
+from sqlalchemy import DDL, event, func, literal_column
+# Registers the full text search functions used by the search documents
+import sqlalchemy.dialects.postgresql  # noqa: F401
 from flask_login import UserMixin
+from sqlalchemy.orm import validates
+import time
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from hashing import hash_password, verify_password
+
+
+# Text search configuration for the PostgreSQL full text documents
+SEARCH_CONFIG = literal_column("'english'::regconfig")
+
+
+def task_search_document(title, description):
+    """
+    The PostgreSQL full text document for a task's title and description.
+    Constants are rendered inline rather than as bound parameters so
+    queries using this expression match the index definition exactly.
+    """
+    return func.to_tsvector(
+        SEARCH_CONFIG,
+        func.coalesce(title, literal_column("''"))
+        + literal_column("' '")
+        + func.coalesce(description, literal_column("''")),
+    )
+
+
+def project_search_document(name):
+    """
+    The PostgreSQL full text document for a project's name.
+    """
+    return func.to_tsvector(SEARCH_CONFIG, name)
 
 
 # User model for authentication and profiles
@@ -12,7 +42,7 @@ class User(UserMixin, db.Model):
     last_name = db.Column(db.String(64))
     username = db.Column(db.String(64), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationship: A user can create many projects
@@ -21,10 +51,10 @@ class User(UserMixin, db.Model):
     )
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -36,16 +66,61 @@ class Project(db.Model):
     name = db.Column(db.String(128), nullable=False)
     description = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Bumped whenever the project or any of its tasks change,
+    # see queries.bump_project_version
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+    version = db.Column(
+        db.Integer, default=1, server_default='1', nullable=False
+    )
     # Creator of the project
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey('user.id'), nullable=False, index=True
+    )
+    # Set while the worker deletes a large project in batches, which
+    # hides it everywhere, see queries.finish_project_deletions
+    deleting = db.Column(
+        db.Boolean, default=False, server_default=db.false(), nullable=False
+    )
 
     # Relationship: A project can have many tasks
-    tasks = db.relationship('Task', backref='project', lazy='dynamic')
+    # Tasks are removed by the database when their project is deleted
+    tasks = db.relationship(
+        'Task', backref='project', lazy='dynamic', passive_deletes=True
+    )
+
+    # GIN index for full text search on PostgreSQL
+    # (SQLite uses an FTS5 table instead, see search.py)
+    __table_args__ = (
+        db.Index(
+            'ix_project_search', project_search_document(name),
+            postgresql_using='gin',
+        ).ddl_if(dialect='postgresql'),
+    )
 
     def __repr__(self):
         return f'<Project {self.name}>'
 
 
+# Kanban columns, in board order
+TASK_STATUSES = ('To Do', 'In Progress', 'Done')
+
+# Priority names mapped to their sort rank (lower is more urgent)
+PRIORITY_RANKS = {'High': 1, 'Medium': 2, 'Low': 3}
+# Rank given to any priority outside PRIORITY_RANKS
+UNKNOWN_PRIORITY_RANK = 99
+
+
+def default_position():
+    """
+    The position of a new task within its column.
+    Creation time keeps new cards after existing ones; moving a card
+    gives it a position between its new neighbours.
+    """
+    return time.time()
+
+
 # Task model for individual items within a project
 class Task(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -55,12 +130,111 @@ class Task(db.Model):
     status = db.Column(db.String(64), default='To Do', nullable=False)
     # e.g., 'Low', 'Medium', 'High'
     priority = db.Column(db.String(64), default='Medium', nullable=False)
+    # Numeric rank of the priority so it can be ordered (and indexed) in SQL
+    priority_rank = db.Column(
+        db.Integer, default=PRIORITY_RANKS['Medium'], nullable=False
+    )
     due_date = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Order within the kanban column, lowest first
+    position = db.Column(db.Float, default=default_position, nullable=False)
+    # Changes on every update, so it versions cached task cards
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
     # Relationships
     # A task belongs to one project
     project_id = db.Column(db.Integer, db.ForeignKey(
-        'project.id'), nullable=False)
+        'project.id', ondelete='CASCADE'), nullable=False)
+
+    __table_args__ = (
+        # Each kanban column is read as a range scan over one of these,
+        # ending in the id that breaks ties so pages never sort
+        db.Index('ix_task_project_status_created_at_id',
+                 'project_id', 'status', 'created_at', 'id'),
+        db.Index('ix_task_project_status_due_date_id',
+                 'project_id', 'status', 'due_date', 'id'),
+        db.Index('ix_task_project_status_priority_rank_id',
+                 'project_id', 'status', 'priority_rank', 'id'),
+        db.Index('ix_task_project_status_position_id',
+                 'project_id', 'status', 'position', 'id'),
+        # The due digest refresh reads upcoming tasks as a range scan
+        db.Index('ix_task_due_date', 'due_date'),
+        # GIN index for full text search on PostgreSQL
+        db.Index(
+            'ix_task_search', task_search_document(title, description),
+            postgresql_using='gin',
+        ).ddl_if(dialect='postgresql'),
+    )
+
+    @validates('priority')
+    def _sync_priority_rank(self, key, priority):
+        # Keep the stored rank in step with the priority name
+        self.priority_rank = priority_rank(priority)
+        return priority
 
     def __repr__(self):
         return f'<Task {self.title}>'
+
+
+def priority_rank(priority):
+    """
+    Return the sort rank for a priority name.
+    """
+    return PRIORITY_RANKS.get(priority, UNKNOWN_PRIORITY_RANK)
+
+
+def priority_rank_sql(column):
+    """
+    SQL computing the sort rank from the priority name in column.
+    """
+    ranks = " ".join(
+        f"WHEN '{name}' THEN {rank}" for name, rank in PRIORITY_RANKS.items()
+    )
+    return f"CASE {column} {ranks} ELSE {UNKNOWN_PRIORITY_RANK} END"
+
+
+# Derives priority_rank on PostgreSQL for writers that do not set it,
+# such as the previous release still serving while migrations run
+PRIORITY_RANK_TRIGGER_DDL = (
+    f"""
+    CREATE OR REPLACE FUNCTION task_priority_rank() RETURNS trigger AS $$
+    BEGIN
+        NEW.priority_rank := {priority_rank_sql('NEW.priority')};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS task_priority_rank ON task",
+    """
+    CREATE TRIGGER task_priority_rank
+    BEFORE INSERT OR UPDATE OF priority ON task
+    FOR EACH ROW EXECUTE FUNCTION task_priority_rank()
+    """,
+)
+
+for statement in PRIORITY_RANK_TRIGGER_DDL:
+    event.listen(
+        Task.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="postgresql"),
+    )
+
+
+# Due digest entry: an open task that is overdue or due soon, kept per
+# user by the background worker (see digest.py) so the dashboard can
+# list them without scanning every task
+class DueTask(db.Model):
+    task_id = db.Column(db.Integer, db.ForeignKey(
+        'task.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey(
+        'user.id', ondelete='CASCADE'), nullable=False)
+    due_date = db.Column(db.DateTime, nullable=False)
+    computed_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_due_task_user_due_date', 'user_id', 'due_date'),
+    )
+
+    def __repr__(self):
+        return f'<DueTask {self.task_id}>'
@@ -0,0 +1,427 @@
+# queries.py
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import (
+    and_,
+    case,
+    delete,
+    func,
+    select,
+    tuple_,
+    update,
+)
+from db import db
+from models import DueTask, Project, Task, TASK_STATUSES, default_position
+
+# Sort keys offered on the project details page, mapped to Task columns
+SORT_COLUMNS = {
+    'created_at': Task.created_at,
+    'due_date': Task.due_date,
+    'priority': Task.priority_rank,
+    'manual': Task.position,
+}
+DEFAULT_SORT_BY = 'created_at'
+
+# Spacing between positions after a column is rebalanced, the smallest
+# gap a move may split, and the gap below which the periodic sweep
+# rebalances a column ahead of time
+POSITION_SPACING = 1.0
+MIN_POSITION_GAP = 1e-6
+CROWDED_POSITION_GAP = 1e-3
+
+
+def normalise_sort(sort_by, sort_order):
+    """
+    Fall back to the default sort for any unknown key or direction.
+    Manual order is always ascending, top card first.
+    """
+    if sort_by not in SORT_COLUMNS:
+        sort_by = DEFAULT_SORT_BY
+    if sort_by == 'manual':
+        sort_order = 'asc'
+    elif sort_order not in ('asc', 'desc'):
+        sort_order = 'desc'
+    return sort_by, sort_order
+
+
+def task_ordering(sort_by, sort_order):
+    """
+    Build the ORDER BY clause for a kanban column.
+    Tasks without a due date always sit after dated tasks when
+    ascending and before them when descending, and Task.id breaks
+    ties so the order is stable.
+    """
+    column = SORT_COLUMNS[sort_by]
+    if sort_order == 'desc':
+        key, tiebreak = column.desc(), Task.id.desc()
+        if sort_by == 'due_date':
+            key = key.nulls_first()
+    else:
+        key, tiebreak = column.asc(), Task.id.asc()
+        if sort_by == 'due_date':
+            key = key.nulls_last()
+    return key, tiebreak
+
+
+def column_query(project_id, status, sort_by, sort_order):
+    """
+    Return a query for one kanban column, ordered in the database.
+    """
+    return (
+        Task.query
+        .filter(Task.project_id == project_id, Task.status == status)
+        .order_by(*task_ordering(sort_by, sort_order))
+    )
+
+
+# How to read back cursor values that are not datetimes
+CURSOR_VALUE_TYPES = {'priority': int, 'manual': float}
+
+
+def encode_cursor(task, sort_by):
+    """
+    Encode the position of a task within a column as an opaque cursor.
+    """
+    value = getattr(task, SORT_COLUMNS[sort_by].key)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, task.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort_by):
+    """
+    Decode a cursor made by encode_cursor.
+    Raises ValueError if the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, task_id = json.loads(base64.urlsafe_b64decode(padded))
+        if value is not None:
+            value = CURSOR_VALUE_TYPES.get(sort_by, datetime.fromisoformat)(
+                value)
+        return value, int(task_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError(f'Invalid cursor: {cursor!r}') from e
+
+
+def after_cursor(sort_by, sort_order, value, task_id):
+    """
+    Build the keyset conditions selecting tasks after a cursor position,
+    as a list of ranges to read in turn. Mirrors task_ordering,
+    including where undated tasks sit. Each range is one seek in the
+    column's index: dated positions are compared as a (value, id) row,
+    and undated tasks, which a row comparison cannot reach, get a range
+    of their own.
+    """
+    column = SORT_COLUMNS[sort_by]
+    descending = sort_order == 'desc'
+
+    if value is None:
+        # Only due_date is nullable; undated tasks sit first when
+        # descending and last when ascending
+        past_id = Task.id < task_id if descending else Task.id > task_id
+        undated = and_(column.is_(None), past_id)
+        return [undated, column.isnot(None)] if descending else [undated]
+
+    position, cursor = tuple_(column, Task.id), tuple_(value, task_id)
+    ranges = [position < cursor if descending else position > cursor]
+    if sort_by == 'due_date' and not descending:
+        # Undated tasks follow every dated task
+        ranges.append(column.is_(None))
+    return ranges
+
+
+def task_page(query, sort_by, sort_order, limit, cursor=None):
+    """
+    Return one page of an ordered task query and the cursor for the
+    next page. The next cursor is None once the query is exhausted.
+    Raises ValueError if the cursor is malformed.
+    """
+    ranges = [None]
+    if cursor:
+        value, task_id = decode_cursor(cursor, sort_by)
+        ranges = after_cursor(sort_by, sort_order, value, task_id)
+
+    # Fetch one extra row to find out whether another page exists,
+    # moving on to the next range only when this one runs out
+    tasks = []
+    for condition in ranges:
+        ranged = query if condition is None else query.filter(condition)
+        tasks += ranged.limit(limit + 1 - len(tasks)).all()
+        if len(tasks) > limit:
+            break
+    next_cursor = None
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        next_cursor = encode_cursor(tasks[-1], sort_by)
+    return tasks, next_cursor
+
+
+def column_page(project_id, status, sort_by, sort_order, limit,
+                cursor=None):
+    """
+    Return one page of a kanban column and the cursor for the next page.
+    Raises ValueError if the cursor is malformed.
+    """
+    sort_by, sort_order = normalise_sort(sort_by, sort_order)
+    query = column_query(project_id, status, sort_by, sort_order)
+    return task_page(query, sort_by, sort_order, limit, cursor)
+
+
+def kanban_columns(project_id, sort_by, sort_order, limit):
+    """
+    Return a dict of status -> (first page of tasks, next cursor)
+    for a project.
+    """
+    return {
+        status: column_page(project_id, status, sort_by, sort_order, limit)
+        for status in TASK_STATUSES
+    }
+
+
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def project_rollups(user_id, now=None):
+    """
+    Return a dict of project id -> task counts for all of a user's
+    projects, computed with a single GROUP BY query.
+    Each entry has 'To Do', 'In Progress', 'Done' and 'Overdue' counts.
+    Projects without tasks are absent; use empty_rollup() for them.
+    """
+    now = now or datetime.utcnow()
+    overdue = and_(Task.due_date < now, Task.status != 'Done')
+    rows = (
+        db.session.query(
+            Task.project_id,
+            *[_count_where(Task.status == status)
+              for status in TASK_STATUSES],
+            _count_where(overdue),
+        )
+        .join(Project, Project.id == Task.project_id)
+        .filter(Project.user_id == user_id, ~Project.deleting)
+        .group_by(Task.project_id)
+        .all()
+    )
+    labels = TASK_STATUSES + ('Overdue',)
+    return {
+        project_id: dict(zip(labels, counts))
+        for project_id, *counts in rows
+    }
+
+
+def empty_rollup():
+    """
+    Return the rollup for a project that has no tasks.
+    """
+    return dict.fromkeys(TASK_STATUSES + ('Overdue',), 0)
+
+
+def delete_project_tasks(project_id):
+    """
+    Delete every task in a project with a single DELETE statement.
+    The caller owns the transaction.
+    """
+    db.session.execute(
+        delete(Task)
+        .where(Task.project_id == project_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_project_in_batches(project_id, batch_size):
+    """
+    Delete a project's tasks in bounded batches, committing after each,
+    then delete the project itself.
+    Used for very large projects so no single transaction holds locks
+    on the whole task set.
+    """
+    while True:
+        batch = (
+            select(Task.id)
+            .where(Task.project_id == project_id)
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        result = db.session.execute(
+            delete(Task)
+            .where(Task.id.in_(batch))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        if result.rowcount < batch_size:
+            break
+
+    db.session.execute(delete(Project).where(Project.id == project_id))
+    db.session.commit()
+
+
+def finish_project_deletions(batch_size):
+    """
+    Delete every project marked as deleting, in batches. Each batch
+    commits and the project row goes last, so a run cut short by a
+    restart is simply picked up by the next.
+    Returns the number of projects deleted.
+    """
+    project_ids = db.session.scalars(
+        select(Project.id).where(Project.deleting)
+    ).all()
+    for project_id in project_ids:
+        delete_project_in_batches(project_id, batch_size)
+    return len(project_ids)
+
+
+def reposition_task(task, status, before=None):
+    """
+    Move a task to the end of a column, or just above the task `before`
+    in that column, by giving it a position between its new neighbours.
+    Only the moved task's row changes, unless the gap it lands in is
+    too narrow to split, when the column is rebalanced first.
+    The caller owns the transaction.
+    """
+    position = _position_before(task, status, before)
+    if position is None:
+        rebalance_column(task.project_id, status)
+        db.session.refresh(before, ['position'])
+        position = _position_before(task, status, before)
+    task.status = status
+    task.position = position
+    return task
+
+
+def change_task_status(task, status):
+    """
+    Set a task's status, sending it to the end of its new column's
+    manual order when the status changes.
+    The caller owns the transaction.
+    """
+    if status != task.status:
+        reposition_task(task, status)
+    return task
+
+
+def _position_before(task, status, before):
+    # The position just above `before`, or at the end of the column,
+    # or None if there is no usable gap left there
+    column = (
+        db.session.query(func.max(Task.position))
+        .filter(Task.project_id == task.project_id, Task.status == status,
+                Task.id != task.id)
+    )
+    if before is None:
+        last = column.scalar()
+        if last is None:
+            return default_position()
+        return max(default_position(), last + POSITION_SPACING)
+
+    previous = column.filter(Task.position < before.position).scalar()
+    if previous is None:
+        return before.position - POSITION_SPACING
+    if before.position - previous < MIN_POSITION_GAP:
+        return None
+    return (previous + before.position) / 2
+
+
+def rebalance_column(project_id, status):
+    """
+    Respace the positions of a column evenly, keeping its order.
+    The caller owns the transaction.
+    """
+    in_column = (Task.project_id == project_id, Task.status == status)
+    # Locked, so no card leaves the column between the read and the
+    # update; the update checks the column too, for SQLite
+    task_ids = db.session.scalars(
+        select(Task.id)
+        .where(*in_column)
+        .order_by(Task.position, Task.id)
+        .with_for_update()
+    ).all()
+    if task_ids:
+        db.session.execute(
+            update(Task).where(*in_column),
+            [
+                {'id': task_id, 'position': (i + 1) * POSITION_SPACING}
+                for i, task_id in enumerate(task_ids)
+            ],
+            # Loaded tasks keep their old positions until refreshed
+            execution_options={'synchronize_session': None},
+        )
+
+
+def crowded_columns(min_gap=CROWDED_POSITION_GAP):
+    """
+    Return (project id, status) for every column with two neighbouring
+    positions closer than min_gap, found in one windowed query.
+    """
+    previous = func.lag(Task.position).over(
+        partition_by=(Task.project_id, Task.status),
+        order_by=(Task.position, Task.id),
+    )
+    gaps = select(
+        Task.project_id,
+        Task.status,
+        (Task.position - previous).label('gap'),
+    ).subquery()
+    return db.session.execute(
+        select(gaps.c.project_id, gaps.c.status)
+        .where(gaps.c.gap < min_gap)
+        .distinct()
+    ).all()
+
+
+def rebalance_crowded_columns():
+    """
+    Rebalance every column whose positions are getting too close to
+    split, committing after each. Run periodically so drag and drop
+    rarely has to rebalance while a user waits. Each project's version
+    is bumped too, as its board shows the positions.
+    Returns the number of columns rebalanced.
+    """
+    columns = crowded_columns()
+    for project_id, status in columns:
+        rebalance_column(project_id, status)
+        bump_project_version(project_id)
+        db.session.commit()
+    return len(columns)
+
+
+def bump_project_version(project_id):
+    """
+    Mark a project as changed, so cached copies of its pages and of the
+    dashboard listing it are no longer valid.
+    Call in the same transaction as the change.
+    """
+    db.session.execute(
+        update(Project)
+        .where(Project.id == project_id)
+        .values(version=Project.version + 1, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def dashboard_version(user_id):
+    """
+    Return (project count, summed versions, latest update, due digest
+    size, latest due digest change) for a user in one aggregate query.
+    Any change to a project, its tasks, the set of projects or the
+    user's due digest changes this tuple.
+    """
+    digest = (
+        select(DueTask.computed_at)
+        .where(DueTask.user_id == user_id)
+        .subquery()
+    )
+    digest_size = select(func.count()).select_from(digest).scalar_subquery()
+    digest_changed = select(
+        func.max(digest.c.computed_at)
+    ).scalar_subquery()
+    return db.session.query(
+        func.count(Project.id),
+        func.coalesce(func.sum(Project.version), 0),
+        func.max(Project.updated_at),
+        digest_size,
+        digest_changed,
+    ).filter(Project.user_id == user_id, ~Project.deleting).one()
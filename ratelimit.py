@@ -0,0 +1,105 @@
+# ratelimit.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class SlidingWindowLimiter:
+    """
+    Allows at most `limit` hits per key in any `window` seconds.
+
+    Uses the sliding window counter approximation: each key keeps only
+    the counts for the current and previous fixed windows, and the
+    previous count is weighted by how much of it still overlaps the
+    sliding window. That is three numbers per key, whatever the limit.
+    At most max_keys keys are tracked; the least recently seen go first.
+    """
+
+    def __init__(self, limit, window, max_keys=100000):
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self._counters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, now=None):
+        """
+        Record a hit for key and return whether it is within the limit.
+        Hits over the limit are not recorded.
+        """
+        now = time.time() if now is None else now
+        current = int(now // self.window)
+        with self._lock:
+            window, previous, count = self._counters.get(key, (current, 0, 0))
+            if window != current:
+                # Roll forward; anything older than one window is dropped
+                previous = count if window == current - 1 else 0
+                window, count = current, 0
+            overlap = 1 - (now % self.window) / self.window
+            if previous * overlap + count >= self.limit:
+                allowed = False
+            else:
+                allowed = True
+                count += 1
+            self._counters[key] = (window, previous, count)
+            self._counters.move_to_end(key)
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+        return allowed
+
+    def reset(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+
+class RedisSlidingWindowLimiter:
+    """
+    The same sliding window counter kept in a Redis-compatible server,
+    so every gunicorn worker shares one set of counts.
+    """
+
+    def __init__(self, url, prefix, limit, window):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "The redis package is required for a shared rate limit store"
+            ) from e
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.limit = limit
+        self.window = window
+
+    def _key(self, key, window):
+        return f"{self.prefix}{key}:{window}"
+
+    def hit(self, key, now=None):
+        now = time.time() if now is None else now
+        current = int(now // self.window)
+        previous, count = self._client.mget(
+            self._key(key, current - 1), self._key(key, current)
+        )
+        overlap = 1 - (now % self.window) / self.window
+        if int(previous or 0) * overlap + int(count or 0) >= self.limit:
+            return False
+        pipeline = self._client.pipeline()
+        pipeline.incr(self._key(key, current))
+        pipeline.expire(self._key(key, current), self.window * 2)
+        pipeline.execute()
+        return True
+
+    def reset(self, key):
+        current = int(time.time() // self.window)
+        self._client.delete(
+            self._key(key, current - 1), self._key(key, current)
+        )
+
+
+def make_limiter(url, prefix, limit, window, max_keys=100000):
+    """
+    Return a Redis backed limiter when a URL is configured,
+    otherwise an in-process one.
+    """
+    if url:
+        return RedisSlidingWindowLimiter(url, prefix, limit, window)
+    return SlidingWindowLimiter(limit, window, max_keys=max_keys)
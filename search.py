@@ -0,0 +1,156 @@
+# search.py
+from sqlalchemy import (
+    DDL,
+    Float,
+    Integer,
+    event,
+    func,
+    or_,
+    select,
+    text,
+    union_all,
+)
+from db import db
+from models import (
+    Project,
+    Task,
+    SEARCH_CONFIG,
+    project_search_document,
+    task_search_document,
+)
+
+# SQLite has no tsvector, so local development searches an FTS5 table
+# kept in step with the task table by triggers
+SQLITE_FTS_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5(
+        title, description, content='task', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS task_fts_insert AFTER INSERT ON task BEGIN
+        INSERT INTO task_fts (rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS task_fts_delete AFTER DELETE ON task BEGIN
+        INSERT INTO task_fts (task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS task_fts_update
+    AFTER UPDATE OF title, description ON task BEGIN
+        INSERT INTO task_fts (task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO task_fts (rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+)
+
+for statement in SQLITE_FTS_DDL:
+    event.listen(
+        Task.__table__,
+        "after_create",
+        DDL(statement).execute_if(dialect="sqlite"),
+    )
+
+
+def _postgres_search(user_id, terms, offset, limit):
+    query = func.websearch_to_tsquery(SEARCH_CONFIG, terms)
+    task_document = task_search_document(Task.title, Task.description)
+    project_document = project_search_document(Project.name)
+
+    # One query per GIN index, as an OR across the join could use
+    # neither and would compute the document of every task the user
+    # has. A task matching both is ranked on both.
+    task_matches = (
+        select(Task.id, func.ts_rank(task_document, query).label("rank"))
+        .join(Project, Project.id == Task.project_id)
+        .where(Project.user_id == user_id, ~Project.deleting,
+               task_document.op("@@")(query))
+    )
+    # Materialized so each project is ranked once, not once per task
+    projects = (
+        select(Project.id,
+               func.ts_rank(project_document, query).label("rank"))
+        .where(Project.user_id == user_id, ~Project.deleting,
+               project_document.op("@@")(query))
+        .cte("matching_projects")
+        .prefix_with("MATERIALIZED")
+    )
+    project_matches = (
+        select(Task.id, projects.c.rank)
+        .join(projects, projects.c.id == Task.project_id)
+    )
+    matches = union_all(task_matches, project_matches).subquery()
+    # Only the page's tasks are loaded, after ranking every match
+    ranked = (
+        select(matches.c.id, func.sum(matches.c.rank).label("rank"))
+        .group_by(matches.c.id)
+        .order_by(func.sum(matches.c.rank).desc(), matches.c.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .subquery()
+    )
+    return (
+        db.session.query(Task, Project)
+        .join(ranked, ranked.c.id == Task.id)
+        .join(Project, Project.id == Task.project_id)
+        .order_by(ranked.c.rank.desc(), ranked.c.id.desc())
+        .all()
+    )
+
+
+def _fts5_phrase(terms):
+    # Quote each word so user input is never parsed as FTS5 syntax
+    return " ".join(
+        '"' + word.replace('"', '""') + '"' for word in terms.split()
+    )
+
+
+def _sqlite_search(user_id, terms, offset, limit):
+    matches = (
+        text(
+            "SELECT rowid AS task_id, bm25(task_fts) AS score "
+            "FROM task_fts WHERE task_fts MATCH :phrase"
+        )
+        .bindparams(phrase=_fts5_phrase(terms))
+        .columns(task_id=Integer, score=Float)
+        .subquery()
+    )
+    # bm25 scores are negative, with the best match lowest
+    return (
+        db.session.query(Task, Project)
+        .join(Project, Project.id == Task.project_id)
+        .outerjoin(matches, matches.c.task_id == Task.id)
+        .filter(
+            Project.user_id == user_id,
+            ~Project.deleting,
+            or_(matches.c.task_id.isnot(None),
+                Project.name.contains(terms, autoescape=True)),
+        )
+        .order_by(matches.c.score.asc().nulls_last(), Task.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
+
+
+def search_tasks(user_id, terms, page, per_page):
+    """
+    Search the titles and descriptions of a user's tasks, and the names
+    of their projects, best matches first.
+    Returns a list of (task, project) pairs for the page and whether
+    another page follows.
+    """
+    if db.engine.dialect.name == "postgresql":
+        run = _postgres_search
+    else:
+        run = _sqlite_search
+
+    # One extra row tells whether another page follows
+    rows = run(user_id, terms, (page - 1) * per_page, per_page + 1)
+    return rows[:per_page], len(rows) > per_page
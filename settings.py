@@ -1,5 +1,52 @@
 import os
 from datetime import timedelta
+from sqlalchemy.pool import NullPool
+from db_pool import TimedQueuePool
+
+
+def env_flag(name, default=False):
+    """
+    Read a true/false environment variable.
+    """
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def engine_options(database_uri):
+    """
+    Build SQLAlchemy engine options from environment variables.
+    Pool settings only apply to server databases, not to SQLite.
+    """
+    if database_uri.startswith('sqlite'):
+        return {}
+
+    options = {'pool_pre_ping': env_flag('DB_POOL_PRE_PING', True)}
+
+    if env_flag('DB_PGBOUNCER'):
+        # A transaction-mode PgBouncer does the pooling, so each checkout
+        # opens a cheap connection to it. Startup options are not passed
+        # through PgBouncer, so set statement_timeout on the database role.
+        options['poolclass'] = NullPool
+        return options
+
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=int(os.getenv('DB_POOL_SIZE', '5')),
+        max_overflow=int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        pool_timeout=int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        # Recycle connections before the server or a proxy drops them
+        pool_recycle=int(os.getenv('DB_POOL_RECYCLE', '1800')),
+    )
+
+    # Milliseconds before the server cancels a query (0 means no limit)
+    statement_timeout = int(os.getenv('DB_STATEMENT_TIMEOUT', '0'))
+    if statement_timeout and database_uri.startswith('postgres'):
+        options['connect_args'] = {
+            'options': f'-c statement_timeout={statement_timeout}'
+        }
+    return options
 
 
 class Config:
@@ -17,3 +64,133 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///site.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     # Suppresses a warning, set to True for event tracking
+
+    # Connection pool and timeout settings, see engine_options()
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    # Number of task cards loaded per kanban column request
+    KANBAN_PAGE_SIZE = int(os.getenv('KANBAN_PAGE_SIZE', '50'))
+
+    # Projects with more tasks than this are hidden at once and deleted
+    # by the worker process (worker.py), which looks for them every
+    # PROJECT_DELETE_INTERVAL seconds and deletes their tasks in batches
+    # of PROJECT_DELETE_BATCH_SIZE (0 deletes every project at once)
+    PROJECT_DELETE_BACKGROUND_THRESHOLD = int(
+        os.getenv('PROJECT_DELETE_BACKGROUND_THRESHOLD', '0')
+    )
+    PROJECT_DELETE_BATCH_SIZE = int(
+        os.getenv('PROJECT_DELETE_BATCH_SIZE', '5000')
+    )
+    PROJECT_DELETE_INTERVAL = int(os.getenv('PROJECT_DELETE_INTERVAL', '10'))
+
+    # Logged in users are cached for USER_CACHE_TTL seconds (0 disables),
+    # in-process by default or in Redis when USER_CACHE_URL is set
+    USER_CACHE_URL = os.getenv('USER_CACHE_URL', '')
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '1024'))
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '300'))
+
+    # Number of results per page of task search
+    SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '20'))
+
+    # Rows inserted per statement by task import, and rows per chunk
+    # streamed by task export
+    TASK_IMPORT_BATCH_SIZE = int(os.getenv('TASK_IMPORT_BATCH_SIZE', '1000'))
+    TASK_EXPORT_CHUNK_SIZE = int(os.getenv('TASK_EXPORT_CHUNK_SIZE', '1000'))
+
+    # Per-request query and timing instrumentation, served at /metrics
+    # (bearer token protected when METRICS_TOKEN is set)
+    METRICS_ENABLED = env_flag('METRICS_ENABLED')
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+    # Rendered kanban task cards kept in the fragment cache, in-process
+    # by default or in Redis when FRAGMENT_CACHE_URL is set
+    FRAGMENT_CACHE_URL = os.getenv('FRAGMENT_CACHE_URL', '')
+    FRAGMENT_CACHE_SIZE = int(os.getenv('FRAGMENT_CACHE_SIZE', '10000'))
+
+    # Password hashing runs on a pool of PASSWORD_HASH_WORKERS processes
+    # per web worker (0 hashes on the request thread). At most
+    # PASSWORD_HASH_MAX_PENDING hashes run at once across all workers;
+    # beyond that, or when a hash takes over PASSWORD_HASH_TIMEOUT
+    # seconds, the request is turned away. Changing the method or salt
+    # length rehashes passwords on login.
+    PASSWORD_HASH_METHOD = os.getenv(
+        'PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000'
+    )
+    PASSWORD_SALT_LENGTH = int(os.getenv('PASSWORD_SALT_LENGTH', '16'))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))
+    PASSWORD_HASH_MAX_PENDING = int(
+        os.getenv('PASSWORD_HASH_MAX_PENDING', '8')
+    )
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '5'))
+
+    # Login attempts allowed per client IP and per username within
+    # LOGIN_RATE_WINDOW seconds (0 disables that limit). Counts are kept
+    # in-process, or in Redis when RATE_LIMIT_STORAGE_URL is set.
+    LOGIN_RATE_LIMIT_PER_IP = int(os.getenv('LOGIN_RATE_LIMIT_PER_IP', '20'))
+    LOGIN_RATE_LIMIT_PER_USERNAME = int(
+        os.getenv('LOGIN_RATE_LIMIT_PER_USERNAME', '5')
+    )
+    LOGIN_RATE_WINDOW = int(os.getenv('LOGIN_RATE_WINDOW', '300'))
+    RATE_LIMIT_STORAGE_URL = os.getenv('RATE_LIMIT_STORAGE_URL', '')
+
+    # Number of proxies in front of the app, so the client IP is read
+    # from X-Forwarded-For. Defaults to Heroku's router on a dyno, where
+    # the login limit per IP would otherwise be shared by every client.
+    TRUSTED_PROXY_COUNT = int(
+        os.getenv('TRUSTED_PROXY_COUNT', '1' if os.getenv('DYNO') else '0')
+    )
+
+    # Largest page of tasks the JSON API returns, and the most task
+    # updates accepted by one batch request
+    API_PAGE_SIZE_MAX = int(os.getenv('API_PAGE_SIZE_MAX', '100'))
+    API_BATCH_LIMIT = int(os.getenv('API_BATCH_LIMIT', '200'))
+
+    # Live board updates over Server-Sent Events. Each open board holds
+    # a sync worker for as long as it is open, so enable them with the
+    # gevent profile (GUNICORN_WORKER_CLASS=gevent, see gunicorn.conf.py).
+    # EVENTS_BROKER 'postgres' shares events between workers and dynos
+    # through LISTEN/NOTIFY; the default only reaches the same process.
+    LIVE_UPDATES = env_flag('LIVE_UPDATES')
+    EVENTS_BROKER = os.getenv('EVENTS_BROKER', 'local')
+    EVENTS_HEARTBEAT = float(os.getenv('EVENTS_HEARTBEAT', '15'))
+    EVENTS_STREAM_TIMEOUT = float(os.getenv('EVENTS_STREAM_TIMEOUT', '300'))
+    EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', '100'))
+
+    # The worker process (worker.py) refreshes the overdue and due soon
+    # digest every DIGEST_REFRESH_INTERVAL seconds, counting tasks due
+    # within DUE_SOON_DAYS, and rebalances crowded manual orders every
+    # POSITION_REBALANCE_INTERVAL seconds. The dashboard lists at most
+    # DUE_DIGEST_LIMIT overdue and DUE_DIGEST_LIMIT due soon tasks, with
+    # the full counts.
+    DUE_SOON_DAYS = int(os.getenv('DUE_SOON_DAYS', '3'))
+    DUE_DIGEST_LIMIT = int(os.getenv('DUE_DIGEST_LIMIT', '20'))
+    DIGEST_REFRESH_INTERVAL = int(os.getenv('DIGEST_REFRESH_INTERVAL', '300'))
+    POSITION_REBALANCE_INTERVAL = int(
+        os.getenv('POSITION_REBALANCE_INTERVAL', '3600')
+    )
+
+    # Compiled templates are cached on disk here and shared by every
+    # worker ('' disables). Unset, Jinja keeps them in a private
+    # directory of the current user's under the system temp dir.
+    # Gunicorn workers also open WARMUP_DB_CONNECTIONS connections
+    # before taking traffic.
+    TEMPLATE_CACHE_DIR = os.getenv('TEMPLATE_CACHE_DIR')
+    WARMUP_DB_CONNECTIONS = int(os.getenv('WARMUP_DB_CONNECTIONS', '1'))
+
+    # Fingerprinted assets built by build_assets.py are listed in this
+    # manifest and served with immutable caching. Without it, assets are
+    # served from their source paths ('' disables).
+    STATIC_MANIFEST = os.getenv(
+        'STATIC_MANIFEST',
+        os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            'assets', 'dist', 'manifest.json',
+        ),
+    )
+
+    # Text responses of at least COMPRESSION_MIN_SIZE bytes are gzip or
+    # Brotli compressed. Compressed copies of up to COMPRESSION_CACHE_SIZE
+    # responses with an ETag are kept per worker (0 keeps none).
+    COMPRESSION_ENABLED = env_flag('COMPRESSION_ENABLED', True)
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+    COMPRESSION_CACHE_SIZE = int(os.getenv('COMPRESSION_CACHE_SIZE', '256'))
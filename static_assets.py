@@ -0,0 +1,81 @@
+# static_assets.py
+import json
+import logging
+import mimetypes
+from flask import request, send_from_directory
+from werkzeug.exceptions import NotFound
+
+logger = logging.getLogger(__name__)
+
+# Built files never change under the same name, so browsers may keep
+# them for a year without asking again
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# Precompressed siblings written by build_assets.py, best first
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def load_manifest(path):
+    """
+    Read the manifest written by build_assets.py, mapping source paths
+    to built ones. Returns an empty mapping when assets are not built.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _accepted_encodings():
+    accepted = request.accept_encodings
+    return [
+        (encoding, ext) for encoding, ext in ENCODINGS
+        if accepted[encoding]
+    ]
+
+
+def init_static_assets(app, manifest_path):
+    """
+    Serve the fingerprinted assets listed in the manifest.
+
+    url_for('static', filename=...) links to a file's built copy when
+    there is one, and those copies are served with immutable caching and
+    precompressed when the browser accepts it. Without a manifest,
+    assets are served from their source paths as before.
+    """
+    manifest = load_manifest(manifest_path) if manifest_path else {}
+    built = set(manifest.values())
+    app.extensions["asset_manifest"] = manifest
+    if manifest:
+        logger.info("Serving %s fingerprinted assets", len(manifest))
+
+    @app.url_defaults
+    def fingerprint_static_url(endpoint, values):
+        if endpoint == "static" and values.get("filename") in manifest:
+            values["filename"] = manifest[values["filename"]]
+
+    def static(filename):
+        if filename not in built:
+            return app.send_static_file(filename)
+
+        mimetype = mimetypes.guess_type(filename)[0]
+        response = None
+        for encoding, ext in _accepted_encodings():
+            try:
+                response = send_from_directory(
+                    app.static_folder, filename + ext, mimetype=mimetype,
+                    max_age=IMMUTABLE_MAX_AGE,
+                )
+            except NotFound:
+                continue
+            response.content_encoding = encoding
+            break
+        if response is None:
+            response = send_from_directory(
+                app.static_folder, filename, max_age=IMMUTABLE_MAX_AGE)
+        response.vary.add("Accept-Encoding")
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+
+    app.view_functions["static"] = static
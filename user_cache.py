@@ -0,0 +1,60 @@
+# user_cache.py
+import secrets
+from datetime import datetime
+from sqlalchemy.orm import make_transient_to_detached
+from db import db
+from models import User
+
+# User columns kept in the cache. The password hash is left out and
+# loaded from the database only when a password is actually checked.
+CACHED_COLUMNS = ('id', 'first_name', 'last_name', 'username', 'email',
+                  'created_at')
+
+
+class UserCache:
+    """
+    Caches the identity of logged in users so that loading the current
+    user does not need a database round trip on every request.
+
+    Invalidating an entry only reaches other workers when the backend
+    is shared. Otherwise a version handed out by invalidate() and kept
+    in the user's session makes their own requests skip entries cached
+    before the change, whichever worker serves them.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get(self, user_id, version=None):
+        """
+        Return the cached user attached to the current session,
+        or None on a cache miss. With a version, entries stored under
+        any other version are misses too.
+        """
+        data = self.backend.get(str(user_id))
+        if data is None:
+            return None
+        data = dict(data)
+        stored_version = data.pop('version', None)
+        if version is not None and stored_version != version:
+            return None
+        if data['created_at'] is not None:
+            data['created_at'] = datetime.fromisoformat(data['created_at'])
+        user = User(**data)
+        # Present the user to the session as an already loaded row
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def store(self, user, version=None):
+        data = {column: getattr(user, column) for column in CACHED_COLUMNS}
+        data['version'] = version
+        if data['created_at'] is not None:
+            data['created_at'] = data['created_at'].isoformat()
+        self.backend.set(str(user.id), data)
+
+    def invalidate(self, user_id):
+        """
+        Drop a user's entry and return a new version for it.
+        """
+        self.backend.delete(str(user_id))
+        return secrets.token_hex(8)
@@ -0,0 +1,64 @@
+# validation.py
+from datetime import datetime
+from models import PRIORITY_RANKS, TASK_STATUSES, priority_rank
+
+# Format of due dates in forms, imports and exports
+DATE_FORMAT = "%Y-%m-%d"
+
+# Longest task title the database accepts
+MAX_TITLE_LENGTH = 128
+
+
+def task_fields(data, partial=False):
+    """
+    Validate task values from a form, upload row or JSON body and
+    return them ready to store on a Task.
+    With partial=True only the keys present in data are checked and
+    returned, for updates; otherwise defaults fill in missing values.
+    Raises ValueError with a user facing message on invalid input.
+    """
+    fields = {}
+
+    if not partial or "title" in data:
+        title = data.get("title")
+        title = title.strip() if isinstance(title, str) else ""
+        if not title:
+            raise ValueError("Task title is required.")
+        if len(title) > MAX_TITLE_LENGTH:
+            raise ValueError(
+                f"Task title must be at most {MAX_TITLE_LENGTH} characters."
+            )
+        fields["title"] = title
+
+    if not partial or "description" in data:
+        description = data.get("description")
+        if description is not None and not isinstance(description, str):
+            raise ValueError("Task description must be text.")
+        fields["description"] = description or None
+
+    if not partial or "status" in data:
+        status = data.get("status") or TASK_STATUSES[0]
+        if not isinstance(status, str) or status not in TASK_STATUSES:
+            raise ValueError(f"Unknown status: {status}.")
+        fields["status"] = status
+
+    if not partial or "priority" in data:
+        priority = data.get("priority") or "Medium"
+        if not isinstance(priority, str) or priority not in PRIORITY_RANKS:
+            raise ValueError(f"Unknown priority: {priority}.")
+        fields["priority"] = priority
+        # Set explicitly as bulk inserts bypass the ORM validators
+        fields["priority_rank"] = priority_rank(priority)
+
+    if not partial or "due_date" in data:
+        due_date = data.get("due_date")
+        try:
+            fields["due_date"] = (
+                datetime.strptime(due_date, DATE_FORMAT) if due_date else None
+            )
+        except (TypeError, ValueError):
+            raise ValueError(
+                f"Due date must be in YYYY-MM-DD format: {due_date}."
+            ) from None
+
+    return fields
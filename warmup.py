@@ -0,0 +1,90 @@
+# warmup.py
+import logging
+import os
+import time
+from jinja2 import FileSystemBytecodeCache
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Seconds spent in each phase of starting this process, reported at
+# /health so cold start regressions show up after a deploy
+boot_times = {}
+
+
+def install_bytecode_cache(app, directory=None):
+    """
+    Keep compiled templates on disk, so workers and restarts load
+    bytecode instead of parsing every template again. Entries are keyed
+    by the template source's checksum, so edits are never served stale.
+
+    The bytecode is executed when loaded, so the directory must be
+    writable by nobody else. Without one, Jinja creates a private
+    directory for the current user and checks that it owns it.
+    """
+    if directory is not None:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def compile_templates(app):
+    """
+    Load every template into the environment's cache, writing any
+    missing bytecode to disk. Returns the number of templates.
+    """
+    names = app.jinja_env.list_templates(
+        filter_func=lambda name: name.endswith(".html")
+    )
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def build_url_map(app):
+    """
+    Compile the URL map's matcher and builder ahead of the first
+    request.
+    """
+    adapter = app.url_map.bind("localhost")
+    adapter.match("/")
+    adapter.build("index")
+
+
+def warm_pool(engine, connections):
+    """
+    Open up to `connections` database connections and return them to
+    the pool, so the first requests skip connecting and authenticating.
+    """
+    opened = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            opened.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+
+
+def timed(phase, func, *args):
+    """
+    Run func(*args), recording how long it took under boot_times[phase].
+    """
+    started = time.perf_counter()
+    result = func(*args)
+    boot_times[phase] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def warmup(app, engine, pool_connections):
+    """
+    Do the work every first request would otherwise pay for: compile
+    templates, build the URL map and open database connections.
+    Call in each worker once it has forked.
+    """
+    with app.app_context():
+        timed("templates", compile_templates, app)
+        timed("routes", build_url_map, app)
+        if pool_connections:
+            timed("pool", warm_pool, engine, pool_connections)
+    logger.info("Worker %s warmed up: %s", os.getpid(), boot_times)
@@ -0,0 +1,111 @@
+# worker.py
+"""
+Background job runner for CheckMate.
+
+Runs periodic jobs outside the web workers, as the Procfile's worker
+process:
+
+    python worker.py           # run forever
+    python worker.py --once    # run every job once, e.g. from cron
+
+Stops cleanly on SIGTERM, which Heroku sends before restarting dynos.
+"""
+import argparse
+import logging
+import signal
+import threading
+import time
+from app import app
+from digest import refresh_due_digest
+from queries import finish_project_deletions, rebalance_crowded_columns
+
+logger = logging.getLogger("worker")
+
+
+class Job:
+    """
+    A function run every `interval` seconds inside an app context.
+    """
+
+    def __init__(self, name, interval, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.next_run = time.monotonic()
+
+    def run(self):
+        started = time.perf_counter()
+        with app.app_context():
+            try:
+                result = self.func()
+            except Exception:
+                logger.exception("Job %s failed", self.name)
+            else:
+                logger.info("Job %s finished in %.2fs: %s", self.name,
+                            time.perf_counter() - started, result)
+        self.next_run = time.monotonic() + self.interval
+
+
+def jobs():
+    config = app.config
+    return [
+        Job(
+            "refresh_due_digest",
+            config["DIGEST_REFRESH_INTERVAL"],
+            lambda: refresh_due_digest(config["DUE_SOON_DAYS"]),
+        ),
+        Job(
+            "finish_project_deletions",
+            config["PROJECT_DELETE_INTERVAL"],
+            lambda: finish_project_deletions(
+                config["PROJECT_DELETE_BATCH_SIZE"]
+            ),
+        ),
+        Job(
+            "rebalance_crowded_columns",
+            config["POSITION_REBALANCE_INTERVAL"],
+            rebalance_crowded_columns,
+        ),
+    ]
+
+
+def run_forever(jobs, stop):
+    """
+    Run each job when it falls due until stop is set.
+    Jobs run one at a time, so a slow job delays but never overlaps
+    the others.
+    """
+    while not stop.is_set():
+        for job in jobs:
+            if stop.is_set():
+                break
+            if job.next_run <= time.monotonic():
+                job.run()
+        next_run = min(job.next_run for job in jobs)
+        stop.wait(max(0.0, next_run - time.monotonic()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--once", action="store_true",
+                        help="run every job once and exit")
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(name)s %(message)s"
+    )
+
+    if args.once:
+        for job in jobs():
+            job.run()
+        return
+
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stop.set())
+    logger.info("Worker started")
+    run_forever(jobs(), stop)
+    logger.info("Worker stopped")
+
+
+if __name__ == "__main__":
+    main()